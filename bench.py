@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+
+# Throughput benchmark for all PySynth engines
+
+# Usage:
+
+# python bench.py [--synths=a,b,...] [--songs=song1,scale,...] [--scale=N]
+#                 [--runs=N] [--out=bench.json] [--baseline=old.json] [--threshold=.1]
+#                 [--patchpath=DIR]
+
+# Every song from demosongs.py plus a synthetic chromatic scale of N
+# notes (200 by default) is rendered with the render() function of each
+# engine. Each render runs in a fresh Python process, so imports, table
+# setup and caches are the same for every measurement and the peak
+# resident memory (ru_maxrss) belongs to that render alone. With several
+# runs the fastest time and the largest memory use are kept.
+#
+# For each render the wall time, samples per second, real-time factor
+# (audio length / wall time) and peak RSS are printed and written to a
+# JSON file. Given a baseline file from an earlier run, renders that got
+# slower (or use more memory) by more than the threshold fraction are
+# flagged, and the exit status is 1 if there were any.
+#
+# PySynth samp is only included if its samples are found at
+# pysynth_samp.patchpath (or the directory given with --patchpath).
+# The disk note cache (PYSYNTH_CACHE_DIR) is switched off for the runs.
+
+from __future__ import division
+
+import sys, os, json, time, platform, subprocess
+import demosongs, synths
+
+# engines in the order they are benchmarked; samp is checked separately
+engines = ["a", "b", "c", "d", "e", "f", "p", "s", "beeper", "samp"]
+
+def demo_songs():
+	"Return the names of the songs in demosongs.py."
+	return sorted(k for k, v in vars(demosongs).items()
+		if k.startswith("song") and isinstance(v, (list, tuple)))
+
+def scale_song(n):
+	"A chromatic scale of n eighth notes, going up and down over three octaves."
+	keys = ['c', 'c#', 'd', 'd#', 'e', 'f', 'f#', 'g', 'g#', 'a', 'a#', 'b']
+	notes = ['%s%u' % (k, o) for o in (3, 4, 5) for k in keys]
+	cycle = notes + notes[-2:0:-1]
+	return [(cycle[i % len(cycle)], 8) for i in range(n)]
+
+def get_song(name, scale = 200):
+	if name == "scale":
+		return scale_song(scale)
+	return getattr(demosongs, name)
+
+def beeper_song(song):
+	"""Adapt a song for pysynth_beeper, which needs explicit octaves and
+	knows neither accented nor dotted notes."""
+	out = []
+	for note, x in song:
+		note = note.rstrip('*')
+		if note != 'r' and not note[-1].isdigit():
+			note += '4'
+		out.append((note, -x / 1.5 if x < 0 else x))
+	return out
+
+def get_module(synth):
+	if synth == "beeper":
+		import pysynth_beeper
+		return pysynth_beeper
+	return synths.get_synth(synth)
+
+def have_samples(patchpath = None):
+	"Check whether the piano samples of PySynth samp are installed."
+	import pysynth_samp
+	return os.path.isdir(patchpath or pysynth_samp.patchpath)
+
+def run_one(synth, song, scale = 200, patchpath = None):
+	"""Render one song in this process and return the measurements.
+
+	Use measure() to get numbers that do not depend on earlier renders."""
+	import resource
+	mod = get_module(synth)
+	if synth == "samp" and patchpath:
+		mod.patchpath = os.path.join(patchpath, "")
+	s = get_song(song, scale)
+	t0 = time.perf_counter()
+	if synth == "beeper":
+		data, rate = mod.render(beeper_song(s), 120)
+	else:
+		data, rate = mod.render(s, 120, silent = True)
+	wall = time.perf_counter() - t0
+	rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	if sys.platform != "darwin":
+		rss *= 1024		# kilobytes on Linux, bytes on macOS
+	return {
+		"synth": synth,
+		"song": song,
+		"notes": len(s),
+		"audio_s": len(data) / rate,
+		"wall_s": wall,
+		"samples_per_s": len(data) / wall,
+		"rtf": len(data) / rate / wall,
+		"peak_rss_mb": rss / 2**20,
+	}
+
+def measure(synth, song, scale = 200, runs = 1, patchpath = None):
+	"Run run_one() in runs fresh processes, keep the best time and the peak memory."
+	env = dict(os.environ)
+	env.pop("PYSYNTH_CACHE_DIR", None)
+	cmd = [sys.executable, os.path.abspath(__file__), "--child", synth, song, str(scale)]
+	if patchpath:
+		cmd.append(patchpath)
+	best = None
+	for i in range(runs):
+		p = subprocess.run(cmd, stdout = subprocess.PIPE, env = env,
+			cwd = os.path.dirname(os.path.abspath(__file__)), universal_newlines = True)
+		if p.returncode != 0:
+			raise RuntimeError("%s failed on %s" % (synth, song))
+		r = json.loads(p.stdout.strip().splitlines()[-1])
+		if best is None:
+			best = r
+		else:
+			rss = max(best["peak_rss_mb"], r["peak_rss_mb"])
+			if r["wall_s"] < best["wall_s"]:
+				best = r
+			best["peak_rss_mb"] = rss
+	return best
+
+def compare(results, baseline, threshold = .1):
+	"""Add a "change" entry (new / old wall time) to each result found in
+	the baseline, and flags like "slower" or "more_memory" when the
+	change is beyond threshold. Returns the number of regressions."""
+	old = dict(((r["synth"], r["song"]), r) for r in baseline.get("results", []))
+	regressions = 0
+	for r in results:
+		b = old.get((r["synth"], r["song"]))
+		if b is None:
+			continue
+		r["change"] = r["wall_s"] / b["wall_s"]
+		r["rss_change"] = r["peak_rss_mb"] / b["peak_rss_mb"]
+		flags = []
+		if r["change"] > 1 + threshold:
+			flags.append("slower")
+		elif r["change"] < 1 - threshold:
+			flags.append("faster")
+		if r["rss_change"] > 1 + threshold:
+			flags.append("more_memory")
+		if "slower" in flags or "more_memory" in flags:
+			regressions += 1
+		r["flags"] = flags
+	return regressions
+
+def format_result(r):
+	s = "%-6s %-9s %8.3f s %11.0f samples/s %8.1fx real time %7.1f MB" % (
+		r["synth"], r["song"], r["wall_s"], r["samples_per_s"], r["rtf"], r["peak_rss_mb"])
+	if "change" in r:
+		s += "  %+5.0f%% %s" % (100 * (r["change"] - 1), " ".join(r["flags"]))
+	return s
+
+if __name__ == "__main__":
+	if sys.argv[1:2] == ["--child"]:
+		synth, song, scale = sys.argv[2], sys.argv[3], int(sys.argv[4])
+		patchpath = sys.argv[5] if len(sys.argv) > 5 else None
+		print(json.dumps(run_one(synth, song, scale, patchpath)))
+		sys.exit(0)
+
+	use = engines
+	songs = demo_songs() + ["scale"]
+	scale, runs, out, base, threshold, patchpath = 200, 1, "bench.json", None, .1, None
+	for a in sys.argv[1:]:
+		if a.startswith("--synths="):
+			use = a[9:].split(",")
+		elif a.startswith("--songs="):
+			songs = a[8:].split(",")
+		elif a.startswith("--scale="):
+			scale = int(a[8:])
+		elif a.startswith("--runs="):
+			runs = int(a[7:])
+		elif a.startswith("--out="):
+			out = a[6:]
+		elif a.startswith("--baseline="):
+			base = a[11:]
+		elif a.startswith("--threshold="):
+			threshold = float(a[12:])
+		elif a.startswith("--patchpath="):
+			patchpath = a[12:]
+		else:
+			print("Error: unknown option %s!" % a)
+			sys.exit(1)
+	for e in use:
+		if e not in engines:
+			print("Error: unknown synth %s!" % e)
+			sys.exit(1)
+	for s in songs:
+		if s != "scale" and s not in demo_songs():
+			print("Error: unknown song %s!" % s)
+			sys.exit(1)
+	if "samp" in use and not have_samples(patchpath):
+		print("Skipping PySynth samp (no samples found)")
+		use = [e for e in use if e != "samp"]
+
+	results = []
+	for e in use:
+		for s in songs:
+			r = measure(e, s, scale, runs, patchpath)
+			results.append(r)
+			print(format_result(r))
+
+	regressions = 0
+	if base:
+		with open(base) as f:
+			regressions = compare(results, json.load(f), threshold)
+		print()
+		print("Compared with %s:" % base)
+		for r in results:
+			if "change" in r:
+				print(format_result(r))
+		print("%u regression(s) beyond %.0f%%" % (regressions, 100 * threshold))
+
+	with open(out, "w") as f:
+		json.dump({
+			"python": platform.python_version(),
+			"platform": platform.platform(),
+			"scale": scale,
+			"runs": runs,
+			"results": results,
+		}, f, indent = 1)
+	print("Results written to", out)
+	sys.exit(1 if regressions else 0)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+# Overlap-add of note waveforms for the NumPy synths (PySynth B, E, S and samp)
+
+# The engines produce their notes as (position, waveform) pairs in
+# order of increasing position, followed by (end position, None).
+# overlap_add() sums the whole song into one array; iter_blocks() hands
+# out finished 16-bit blocks as soon as no later note can reach them,
+# so memory use only depends on the longest note, not on the song.
+
+from __future__ import division
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+def overlap_add(notes, rate, tail = 2.):
+	"""Sum all notes into one float64 array.
+
+	Returns (data, out_len): the song ends tail seconds after the end
+	position of the last note or rest; data may extend beyond out_len
+	where notes ring out."""
+	data = np.zeros(60 * rate)
+	for pos, w in notes:
+		if w is None:
+			out_len = int(tail * rate + pos + .5)
+			break
+		if pos + len(w) > len(data):
+			data = np.concatenate((data, np.zeros(max(pos + len(w), 2 * len(data)) - len(data))))
+		data[pos:pos+len(w)] += w
+	if out_len > len(data):
+		data = np.concatenate((data, np.zeros(out_len - len(data))))
+	return data, out_len
+
+def normalize(data, out_len):
+	"Cut data to out_len samples and scale the peak to .5 (silence stays silent)."
+	peak = data.max()
+	if peak == 0:
+		return np.zeros(out_len)
+	return data[:out_len] / (peak * 2.)
+
+class Limiter(object):
+	"""Look-ahead peak limiter.
+
+	The gain ramps down linearly over the lookahead samples before a
+	peak, so it reaches its target exactly at the peak, and recovers by
+	at most 1 / release per sample afterwards. The first lookahead
+	samples of the output are dropped, so the output is not delayed;
+	call flush() at the end to get the remaining samples."""
+
+	def __init__(self, ceiling = .5, lookahead = 441, release = 22050):
+		self.ceiling = ceiling
+		self.lookahead = lookahead
+		self.release = 1. / release
+		self.buf = np.zeros(lookahead)
+		self.hist = np.ones(lookahead)	# last gains before smoothing
+		self.skip = lookahead
+		self.g = 1.
+
+	def process(self, x):
+		"Limit the float samples x, return the output so far."
+		n = len(x)
+		if not n:
+			return x
+		L = self.lookahead
+		xx = np.concatenate((self.buf, x))
+		t = self.ceiling / np.maximum(np.abs(xx), self.ceiling)
+		# smallest target gain within the look-ahead window of each sample
+		t = sliding_window_view(t, L + 1).min(axis = 1)
+		# r[i] = min(t[i], r[i-1] + release), in closed form
+		ramp = np.arange(n + 1) * self.release
+		r = np.minimum.accumulate(np.concatenate(([self.g], t)) - ramp)[1:] + ramp[1:]
+		self.g = r[-1]
+		# the moving average over L + 1 samples turns the steps of r into
+		#   linear ramps; it never exceeds t at a peak, because all the
+		#   gains it averages there are at most the peak's target
+		c = np.cumsum(np.concatenate(([0.], self.hist, r)))
+		g = (c[L+1:] - c[:-L-1]) / (L + 1)
+		self.hist = np.concatenate((self.hist, r))[-L:]
+		self.buf = xx[n:]
+		out = xx[:n] * g
+		out, self.skip = out[self.skip:], max(0, self.skip - n)
+		return out
+
+	def flush(self):
+		"Return the samples still held back for the look-ahead."
+		return self.process(np.zeros(self.lookahead))
+
+def to_pcm(x):
+	"Convert float samples (1.0 = 32000) to int16, truncating like make_wav."
+	return np.clip(np.trunc(32000. * x), -32768, 32767).astype(np.int16)
+
+def iter_blocks(notes, rate, block_size = 8192, gain = None, tail = 2.,
+		drive = .25, ceiling = .5, lookahead = .01):
+	"""Overlap-add notes block by block, yield int16 arrays of block_size samples.
+
+	With a fixed gain the samples are simply scaled. Without one they are
+	scaled by drive and a look-ahead limiter keeps them below ceiling
+	(.5 is the peak level make_wav() normalizes to). The last block may
+	be shorter."""
+	if gain is None:
+		lim = Limiter(ceiling, max(1, int(lookahead * rate)))
+		scale = drive
+	else:
+		lim = None
+		scale = gain
+	acc = {}	# unfinished blocks by block number
+	state = {'next': 0, 'pending': np.zeros(0)}
+
+	def add(pos, w):
+		k, off = divmod(pos, block_size)
+		i = 0
+		while i < len(w):
+			if k not in acc:
+				acc[k] = np.zeros(block_size)
+			n = min(block_size - off, len(w) - i)
+			acc[k][off:off+n] += w[i:i+n]
+			i += n
+			k += 1
+			off = 0
+
+	def emit(x):
+		x = x * scale
+		if lim is not None:
+			x = lim.process(x)
+		p = np.concatenate((state['pending'], x))
+		m = len(p) // block_size * block_size
+		state['pending'] = p[m:]
+		return [to_pcm(p[i:i+block_size]) for i in range(0, m, block_size)]
+
+	def finish_block():
+		k = state['next']
+		state['next'] += 1
+		return acc.pop(k) if k in acc else np.zeros(block_size)
+
+	out_len = None
+	for pos, w in notes:
+		if w is None:
+			out_len = int(tail * rate + pos + .5)
+			break
+		if pos < state['next'] * block_size:
+			raise ValueError("notes must be sorted by start position")
+		# all blocks before the one this note starts in are final now
+		while (state['next'] + 1) * block_size <= pos:
+			for b in emit(finish_block()):
+				yield b
+		add(pos, w)
+
+	while state['next'] * block_size < out_len:
+		start = state['next'] * block_size
+		for b in emit(finish_block()[:out_len - start]):
+			yield b
+	if lim is not None:
+		state['pending'] = np.concatenate((state['pending'], lim.flush()))
+	while len(state['pending']):
+		yield to_pcm(state['pending'][:block_size])
+		state['pending'] = state['pending'][block_size:]
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+# Optional on-disk cache of rendered waveforms, shared between processes
+
+# Arrays are stored as .npy files and opened with np.load(mmap_mode = 'r'),
+# so all processes using the same directory share the pages through the
+# OS page cache. The cache is off unless a directory is given, either with
+# configure() or in the environment:
+#
+#   PYSYNTH_CACHE_DIR   cache directory
+#   PYSYNTH_CACHE_MB    size cap in megabytes (default 1024)
+#
+# When the directory grows beyond the cap, the least recently used files
+# (by modification time, which is updated on every hit) are deleted.
+# Each process keeps a running estimate of the directory size and only
+# scans the directory when the estimate goes over the cap, so files
+# written by other processes are noticed at the next scan.
+
+import os, hashlib, tempfile
+import numpy as np
+
+class DiskCache(object):
+	"Directory of .npy files keyed by a hash of the cache key."
+
+	def __init__(self, path, max_bytes = 1024 * 2**20):
+		self.path = path
+		self.max_bytes = max_bytes
+		self.hits = self.misses = self.writes = self.removed = 0
+		self.size = None	# estimated bytes in the directory (None = not scanned yet)
+		if not os.path.isdir(path):
+			os.makedirs(path)
+
+	def filename(self, key):
+		return os.path.join(self.path,
+			hashlib.sha1(repr(key).encode('utf-8')).hexdigest() + '.npy')
+
+	def get(self, key):
+		"Return a read-only memory-mapped array for key, or None."
+		fn = self.filename(key)
+		try:
+			arr = np.load(fn, mmap_mode = 'r')
+			os.utime(fn, None)
+		except (IOError, OSError, ValueError):
+			self.misses += 1
+			return None
+		self.hits += 1
+		return arr
+
+	def put(self, key, arr):
+		"Store arr under key (atomically, so readers never see partial files)."
+		fn = self.filename(key)
+		try:
+			old = os.path.getsize(fn)
+		except OSError:
+			old = 0
+		fd, tmp = tempfile.mkstemp(suffix = '.tmp', dir = self.path)
+		try:
+			with os.fdopen(fd, 'wb') as f:
+				np.save(f, np.ascontiguousarray(arr))
+				size = f.tell()
+			os.replace(tmp, fn)
+		except (IOError, OSError):
+			try: os.remove(tmp)
+			except OSError: pass
+			return
+		self.writes += 1
+		if self.size is not None:
+			self.size += size - old
+		if self.size is None or self.size > self.max_bytes:
+			self.cleanup()
+
+	def cleanup(self):
+		"Delete least recently used files until the directory fits the cap."
+		files, total = [], 0
+		for e in os.scandir(self.path):
+			if e.name.endswith('.npy'):
+				try: st = e.stat()
+				except OSError: continue
+				files.append((st.st_mtime, st.st_size, e.path))
+				total += st.st_size
+		files.sort()
+		for mtime, size, fn in files:
+			if total <= self.max_bytes:
+				break
+			try:
+				os.remove(fn)
+				self.removed += 1
+			except OSError:
+				pass
+			total -= size
+		self.size = total
+
+	def clear(self):
+		"Delete all cached files."
+		for e in os.scandir(self.path):
+			if e.name.endswith('.npy'):
+				try: os.remove(e.path)
+				except OSError: pass
+		self.size = 0
+
+	def stats(self):
+		return {"hits": self.hits, "misses": self.misses, "writes": self.writes,
+			"removed": self.removed, "path": self.path, "max_bytes": self.max_bytes}
+
+_cache = None
+_configured = False
+
+def configure(path, max_bytes = 1024 * 2**20):
+	"Use the directory path as disk cache (None turns the disk cache off)."
+	global _cache, _configured
+	_cache = DiskCache(path, max_bytes) if path else None
+	_configured = True
+	return _cache
+
+def get_cache():
+	"Return the process' DiskCache, or None if disk caching is off."
+	if not _configured:
+		configure(os.environ.get('PYSYNTH_CACHE_DIR'),
+			int(float(os.environ.get('PYSYNTH_CACHE_MB', 1024)) * 2**20))
+	return _cache
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+# Polyphonic note events for the NumPy synths (PySynth B, E, S and samp)
+
+# Unlike the sequential song format, each event has its own absolute
+# start time, so chords and independent voices can go in one list:
+#
+#   ev = events.make_events([(0., .5, 'c4', 1.), (0., .5, 'e4', 1.), (.5, 1., 67, 1.2)])
+#   data, rate = pysynth_b.render_events(ev)
+#
+# start and dur are in seconds, pitch is a MIDI note number (60 = c4)
+# or a note name, and vel is the volume (1. = normal note, like the
+# boost factor for asterisk notes in songs).
+
+from __future__ import division
+
+import numpy as np
+from mkfreq import getfreq, keys_s
+
+pitchhz, keynum = getfreq()
+
+EVENT_DTYPE = np.dtype([('start', '<f8'), ('dur', '<f8'), ('pitch', '<i2'), ('vel', '<f4')])
+
+def note_pitch(note):
+	"MIDI note number for a note name like 'c#4' (the octave defaults to 4)."
+	if not note[-1].isdigit():
+		note += '4'
+	return keynum[note] + 21
+
+def note_name(pitch):
+	"Note name for a MIDI note number (sharps are used for black keys)."
+	k = int(pitch) - 21
+	return '%s%u' % (keys_s[k % 12], (k + 9) // 12)
+
+def make_events(evs):
+	"""Turn an iterable of (start, dur, pitch, vel) into a sorted event array.
+
+	pitch may be a MIDI note number or a note name. Events with the same
+	start time keep their order."""
+	if isinstance(evs, np.ndarray) and evs.dtype == EVENT_DTYPE:
+		out = evs.copy()
+	else:
+		evs = [(s, d, note_pitch(p) if isinstance(p, str) else p, v) for s, d, p, v in evs]
+		out = np.array(evs, dtype = EVENT_DTYPE)
+	return out[np.argsort(out['start'], kind = 'stable')]
+
+def merge(*evs):
+	"Merge several event arrays into one sorted array."
+	return make_events(np.concatenate(evs))
+
+def from_song(song, bpm = 120, boost = 1.1, start = 0.):
+	"""Convert a song in the (note, duration) format to an event array.
+
+	Timing follows the synths: a note value of 4 is a quarter note,
+	negative values are dotted notes. Asterisk notes get vel = boost."""
+	bpmfac = 120. / bpm
+	t = start
+	evs = []
+	for note, x in song:
+		if note == 'r':
+			t += 2. / x * bpmfac
+			continue
+		vel = 1.
+		if note[-1] == '*':
+			vel = boost
+			note = note[:-1]
+		dur = 2. / (-2. * x / 3. if x < 0 else x) * bpmfac
+		evs.append((t, dur, note_pitch(note), vel))
+		t += dur
+	return make_events(evs)
+
+def notes(ev, render2, rate, transpose = 0, silent = False):
+	"""Yield (position, waveform) for each event, then (end position, None).
+
+	render2(a, b, vol, knum, note) is the note synthesizer of an engine,
+	b being the note length in samples."""
+	ev = make_events(ev)
+	# only the 88 piano keys have a frequency table entry
+	bad = (ev['pitch'] < 21) | (ev['pitch'] > 108)
+	if bad.any():
+		print("Warning, %u event(s) outside the piano range (MIDI 21-108) skipped" % bad.sum())
+	for nn, e in enumerate(ev):
+		if not nn % 4 and silent == False:
+			print("[%u/%u]\t" % (nn+1,len(ev)))
+		if bad[nn]:
+			continue
+		note = note_name(e['pitch'])
+		a = pitchhz[note] * 2**transpose
+		yield int(e['start'] * rate), render2(a, e['dur'] * rate, float(e['vel']), keynum[note], note)
+	yield (ev['start'] + ev['dur']).max() * rate if len(ev) else 0., None
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+# Least-recently-used cache for NumPy arrays with a memory ceiling in bytes
+
+import threading
+from collections import OrderedDict
+
+class LRUCache(object):
+	"Keeps arrays up to max_bytes in total, evicting the least recently used first."
+
+	def __init__(self, max_bytes):
+		self.max_bytes = max_bytes
+		self.entries = OrderedDict()
+		self.nbytes = 0
+		self.hits = self.misses = self.evictions = 0
+		self.lock = threading.Lock()
+
+	def __len__(self):
+		return len(self.entries)
+
+	def __contains__(self, key):
+		return key in self.entries
+
+	def get(self, key):
+		"Return the cached array for key (or None) and mark it as recently used."
+		with self.lock:
+			v = self.entries.get(key)
+			if v is None:
+				self.misses += 1
+			else:
+				self.hits += 1
+				self.entries.move_to_end(key)
+			return v
+
+	def put(self, key, arr):
+		"Store arr under key; arrays larger than the whole budget are not kept."
+		with self.lock:
+			old = self.entries.pop(key, None)
+			if old is not None:
+				self.nbytes -= old.nbytes
+			if arr.nbytes > self.max_bytes:
+				return
+			self.entries[key] = arr
+			self.nbytes += arr.nbytes
+			self._shrink()
+
+	def set_limit(self, max_bytes):
+		"Change the memory ceiling, evicting entries if necessary."
+		with self.lock:
+			self.max_bytes = max_bytes
+			self._shrink()
+
+	def _shrink(self):
+		while self.nbytes > self.max_bytes:
+			k, v = self.entries.popitem(last = False)
+			self.nbytes -= v.nbytes
+			self.evictions += 1
+
+	def clear(self):
+		"Drop all entries and reset the statistics."
+		with self.lock:
+			self.entries.clear()
+			self.nbytes = 0
+			self.hits = self.misses = self.evictions = 0
+
+	def stats(self):
+		"Return a dict with hit/miss/eviction counts and memory use."
+		with self.lock:
+			return {"hits": self.hits, "misses": self.misses,
+				"evictions": self.evictions, "entries": len(self.entries),
+				"bytes": self.nbytes, "max_bytes": self.max_bytes}
@@ -6,6 +6,7 @@ Pranav Ravichandran (me@onloop.net)
 """
 
 import play_wav
+import wavio
 import pysynth, pysynth_b, pysynth_s
 import wave
 import sys
@@ -32,6 +33,8 @@ class mEnv:
 	instrument = ''
 	outFile = ''
 	trashFile = True
+	data = None
+	rate = 44100
 	def __init__(self):
 		''' Constructor class. '''
 
@@ -116,13 +119,25 @@ class mEnv:
 				i += 1
 
 	def play(self, outFile):
-		''' Open the .wav file and play it.'''
+		''' Play the rendered samples (or the .wav file).'''
 
 		if outFile == '':
 			outFile = 'temp.wav'
 
 		a = play_wav.Sound()
-		a.playFile(outFile)
+		if self.data is not None:
+			a.playArray(self.data, self.rate)
+		else:
+			a.playFile(outFile)
+
+	def save(self, outFile):
+		''' Write the rendered samples to the .wav file.'''
+
+		if outFile == '':
+			outFile = 'temp.wav'
+
+		if self.data is not None:
+			wavio.write_wav(outFile, self.data, self.rate)
 
 	def removeFile(self, outFile):
 		''' Delete the .wav file.'''
@@ -130,7 +145,7 @@ class mEnv:
 		if outFile == '':
 			outFile = 'temp.wav'
 
-		if self.trashFile:
+		if self.trashFile and os.path.exists(outFile):
 			os.remove(outFile)
 
 	def synthSounds(self, renderSound, outFile):
@@ -142,13 +157,16 @@ class mEnv:
 		try:
 			# Different cases of input, when optional arguments 'bpm' and 'repeat' are given.
 			if self.bpmVal and self.repeatVal:
-				renderSound.make_wav(self.synthParam, fn = outFile, silent = True, bpm = self.bpmVal, repeat = self.repeatVal)
+				self.data, self.rate = renderSound.render(self.synthParam, silent = True, bpm = self.bpmVal, repeat = self.repeatVal)
 			elif self.bpmVal:
-				renderSound.make_wav(self.synthParam, fn = outFile, silent = True, bpm = self.bpmVal)
+				self.data, self.rate = renderSound.render(self.synthParam, silent = True, bpm = self.bpmVal)
 			elif self.repeatVal:
-				renderSound.make_wav(self.synthParam, fn = outFile, silent = True, repeat = self.repeatVal)
+				self.data, self.rate = renderSound.render(self.synthParam, silent = True, repeat = self.repeatVal)
 			else:
-				renderSound.make_wav(self.synthParam, fn = outFile, silent = True)
+				self.data, self.rate = renderSound.render(self.synthParam, silent = True)
+			# Only write a file if one was asked for.
+			if not self.trashFile:
+				self.save(outFile)
 		except KeyError:
 			print(warningStr)
 			mEnv()
@@ -168,5 +186,6 @@ if __name__ == "__main__":
 			a.trashFile = False
 			if a.outFile == '':
 				a.outFile = 'temp.wav'
+			a.save(a.outFile)
 			print('Could not play file. Saved to ' + a.outFile)
 		a.removeFile(a.outFile)
@@ -1,13 +1,16 @@
 #!/usr/bin/env python3
 
 # Monophonic Python MIDI synthesizer
+#   (event timing and block rendering by the engine in polysynth.py)
 
 import pyaudio
 import mido
-import struct, math, time
+import math, time
+import numpy as np
+import polysynth, wavetable
 
-# sleep time in main loop
-SLEEP = .01
+# sleep time in main loop (MIDI input does not depend on it)
+SLEEP = .1
 
 # audio buffer size (determines latency)
 #      Increase this to e.g. 256 or 512 if there is crackling audio output.
@@ -16,63 +19,97 @@ BSIZE = 128
 # sample rate
 ARATE = 44100
 
+# waveform ("harmonic", "saw", "square" or "triangle", see wavetable.py)
+#   and wavetable size (smaller tables need less memory and cache but
+#   add more interpolation noise)
+WAVE = "harmonic"
+WTSIZE = 2048
+
+# record timing statistics for each audio block? (see rtstats.py)
+#   A summary is printed every STATS_EVERY seconds and all data is written
+#   to STATS_FILE (.csv or .json) at exit.
+STATS = False
+STATS_EVERY = 10
+STATS_FILE = "midi_synth_stats.csv"
+
 ################################################################################
 
-last_note = 0
-xpos = 0
-freq = 0
-amp = 0
-amp_loss = 0
-
-# callback function for audio data
-def callback(in_data, frame_count, time_info, status):
-    global xpos, amp
-
-    data = b""
-    delt = 2 * math.pi / ARATE * freq
-    for i in range(frame_count):
-        if freq > 0:
-            v = math.sin(xpos) + .5 * math.sin(2 * xpos) + .25 * math.sin(4 * xpos)
-            b = struct.pack('h', round(18000 * amp * v))
-            xpos += delt
-            amp *= amp_loss
-        else:
-            b = struct.pack('h', 0)
-        data += b
-    return data, pyaudio.paContinue
-
-inport = mido.open_input()
+class MonoVoice(object):
+    """Single wavetable voice for polysynth.Engine
+
+    A new note replaces the current one, note off only ends the
+    note that is playing."""
+
+    def __init__(self, rate = ARATE):
+        self.rate = rate
+        self.osc = wavetable.WavetableOsc(wavetable.make_table(WAVE, WTSIZE), rate)
+        self.last_note = 0
+        self.freq = 0
+        self.amp = 0
+        self.amp_loss = 0
+
+    def note_on(self, note):
+        self.freq = 440 * 2**((note - 69) / 12)
+        self.last_note = note
+        self.osc.reset()
+        self.amp = 1
+        a_min, a_max, a_sel = math.log(21), math.log(108), math.log(note)
+        lossfac = 50000 - 49000 * ((a_sel - a_min) / (a_max - a_min))
+        lossfac *= self.rate / 44100
+        self.amp_loss = 1 - 1 / lossfac
+
+    def note_off(self, note):
+        if note == self.last_note:
+            self.freq = 0
+            self.last_note = 0
+
+    def playing(self):
+        return int(self.freq > 0)
+
+    def render(self, n):
+        "Return n samples of the current note and advance it."
+        if self.freq <= 0:
+            return np.zeros(n)
+        env = self.amp * self.amp_loss**np.arange(n)
+        self.amp *= self.amp_loss**n
+        return env * self.osc.render(self.freq, n)
+
+monitor = None
+if STATS:
+    import rtstats
+    monitor = rtstats.PerfMonitor(rate = ARATE)
+
+# events are queued with their arrival time and played at the same
+#   offset into the next audio block (see polysynth.Engine)
+engine = polysynth.Engine(ARATE, volume = 18000, bsize = BSIZE,
+    monitor = monitor, voices = MonoVoice())
+
+inport = mido.open_input(callback = engine.on_message)
 paud = pyaudio.PyAudio()
 stream = paud.open(format = paud.get_format_from_width(2),
                     channels = 1,
                     rate = ARATE,
                     output = True,
                     frames_per_buffer = BSIZE,
-                    stream_callback = callback)
+                    stream_callback = engine.callback)
 
 print("latency [s] = %.5f" % stream.get_output_latency())
 
+last_report = time.time()
+
 while True:
-    for msg in inport.iter_pending():
-        if msg.type == "note_on":
-            freq = 440 * 2**((msg.note - 69) / 12)
-            last_note = msg.note
-            xpos = 0
-            amp = 1
-            a_min, a_max, a_sel = math.log(21), math.log(108), math.log(msg.note)
-            lossfac = 50000 - 49000 * ((a_sel - a_min) / (a_max - a_min))
-            lossfac *= ARATE / 44100
-            amp_loss = 1 - 1 / lossfac
-        if msg.type == "note_off":
-            if msg.note == last_note:
-                freq = 0
-                last_note = 0
     try:
         time.sleep(SLEEP)
     except:
         break
+    if monitor and time.time() - last_report >= STATS_EVERY:
+        print(monitor.report())
+        last_report = time.time()
 
 stream.close()
 paud.terminate()
 inport.close()
 
+if monitor:
+    print(monitor.report())
+    monitor.dump(STATS_FILE)
@@ -1,8 +1,59 @@
 #!/usr/bin/env python
 
-# Mix two mono files to get a stereo file
+# Mix two mono files to get a stereo file,
+#   or any number of mono/stereo files with mix_tracks()
 
-import sys, wave, struct
+# Usage:
+
+# python mixfiles.py a.wav b.wav out.wav
+# python mixfiles.py -o out.wav track.wav[:gain[:pan[:offset]]] ...
+
+import sys, wave, struct, math
+
+# NumPy is optional here (PySynth A does not need it); without it
+# the files are mixed frame by frame.
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+def mix_arrays(x1, x2, chann = 2, phase = -1.):
+	"""Mix two mono sample arrays (e.g. from render()) like mix_files.
+
+	Returns an array of shape (n, 2) for stereo or (n,) for mono, where n is
+	the length of the shorter input."""
+	n = min(len(x1), len(x2))
+	x1 = np.asarray(x1[:n], dtype = float)
+	x2 = np.asarray(x2[:n], dtype = float)
+	if chann < 2:
+		return .5 * (x1 + x2)
+	out = np.empty((n, 2))
+	out[:, 0] = phase * .3 * x1 + .7 * x2
+	out[:, 1] = .7 * x1 + phase * .3 * x2
+	return out
+
+def mix_frames(d1, d2, frames, chann = 2, phase = -1.):
+	"Mix two buffers of 16-bit mono frames, return the output frames."
+	if np is None:
+		return mix_frames_py(d1, d2, frames, chann, phase)
+	out = mix_arrays(np.frombuffer(d1, '<i2', frames), np.frombuffer(d2, '<i2', frames), chann, phase)
+	out = np.clip(np.trunc(out), -32768, 32767)
+	return out.astype('<i2').tobytes()
+
+def mix_frames_py(d1, d2, frames, chann = 2, phase = -1.):
+	"Same as mix_frames, without NumPy."
+	def pack(v):
+		# (clipped like mix_frames, instead of failing on loud input)
+		return struct.pack('h', max(-32768, min(32767, int(v))))
+	d3 = []
+	for n in range(frames):
+		a = struct.unpack('h', d1[2*n:2*n+2])[0]
+		b = struct.unpack('h', d2[2*n:2*n+2])[0]
+		if chann < 2:
+			d3.append(pack(.5 * (a + b)))
+		else:
+			d3.append(pack(phase * .3 * a + .7 * b) + pack(.7 * a + phase * .3 * b))
+	return b''.join(d3)
 
 def mix_files(a, b, c, chann = 2, phase = -1.):
 	f1 = wave.open(a, 'r')
@@ -23,25 +74,89 @@ def mix_files(a, b, c, chann = 2, phase = -1.):
 	print("Mixing files, total length %.2f s..." % (frames / float(r1)))
 	d1 = f1.readframes(frames)
 	d2 = f2.readframes(frames)
-	for n in range(frames):
-		if not n % (5 * r1): print(n // r1, 's')
-		if chann < 2:
-			d3 = struct.pack('h', int(
-				.5 * (struct.unpack('h', d1[2*n:2*n+2])[0] +
-				struct.unpack('h', d2[2*n:2*n+2])[0])))
+	f3.writeframesraw(mix_frames(d1, d2, frames, chann, phase))
+	f3.close()
+
+def parse_track(t):
+	"Turn a file name or (fn, gain, pan, offset) tuple into a full tuple."
+	if isinstance(t, str):
+		t = t,
+	return tuple(t) + (1., 0., 0.)[len(t) - 1:]
+
+def mix_tracks(tracks, c, block = 65536):
+	"""Mix mono or stereo 16-bit WAV files into the stereo file c.
+
+	tracks is a list of file names or (file name, gain, pan, offset) tuples:
+	pan goes from -1 (left) to 1 (right) and offset is the start time
+	in seconds (a negative offset skips the start of the file). Shorter
+	tracks are padded with silence. The files are read block by block,
+	so memory use does not depend on their length. Needs NumPy."""
+	if np is None:
+		print("Error: mixing tracks needs NumPy!")
+		sys.exit(1)
+	srcs = []
+	rate = None
+	for t in tracks:
+		fn, gain, pan, offset = parse_track(t)
+		w = wave.open(fn, 'r')
+		if w.getsampwidth() != 2:
+			print("Error: %s is not a 16-bit file!" % fn)
+			sys.exit(1)
+		if rate is None:
+			rate = w.getframerate()
+		elif w.getframerate() != rate:
+			print("Error: frame rates must be the same!")
+			sys.exit(1)
+		if w.getnchannels() == 1:
+			# equal-power panning, unity gain in the center
+			ang = (pan + 1.) * math.pi / 4.
+			gl = gain * math.sqrt(2.) * math.cos(ang)
+			gr = gain * math.sqrt(2.) * math.sin(ang)
 		else:
-			d3 = ( struct.pack('h', int(
-				phase * .3 * struct.unpack('h', d1[2*n:2*n+2])[0] +
-				.7 * struct.unpack('h', d2[2*n:2*n+2])[0])) +
-				struct.pack('h', int(
-				.7 * struct.unpack('h', d1[2*n:2*n+2])[0] +
-				phase * .3 * struct.unpack('h', d2[2*n:2*n+2])[0])) )
-		f3.writeframesraw(d3)
+			# balance control for stereo files
+			gl = gain * min(1., 1. - pan)
+			gr = gain * min(1., 1. + pan)
+		start = int(round(offset * rate))
+		nframes = w.getnframes()
+		if start < 0:
+			skip = min(-start, nframes)
+			w.setpos(skip)
+			nframes -= skip
+			start = 0
+		srcs.append((w, start, start + nframes, np.array((gl, gr))))
+	total = max([end for w, start, end, g in srcs] + [0])
+
+	f3 = wave.open(c, 'w')
+	f3.setnchannels(2)
+	f3.setsampwidth(2)
+	f3.setframerate(rate or 44100)
+	f3.setcomptype('NONE', 'Not Compressed')
+
+	print("Mixing %u files, total length %.2f s..." % (len(srcs), total / float(rate or 44100)))
+	for pos in range(0, total, block):
+		n = min(block, total - pos)
+		out = np.zeros((n, 2))
+		for w, start, end, g in srcs:
+			a, b = max(pos, start), min(pos + n, end)
+			if a >= b:
+				continue
+			x = np.frombuffer(w.readframes(b - a), '<i2').reshape(b - a, -1)
+			out[a-pos:b-pos] += x * g
+		f3.writeframesraw(np.clip(out, -32768, 32767).astype('<i2').tobytes())
 	f3.close()
+	for w, start, end, g in srcs:
+		w.close()
 
 if __name__ == '__main__':
-	if len(sys.argv) == 4:
+	if len(sys.argv) > 2 and sys.argv[1] == '-o':
+		c = sys.argv[2]
+		tracks = []
+		for t in sys.argv[3:]:
+			v = t.split(':')
+			tracks.append((v[0],) + tuple(float(x) for x in v[1:]))
+		print("Mixing %s, output will be %s" % (", ".join(t[0] for t in tracks), c))
+		mix_tracks(tracks, c)
+	elif len(sys.argv) == 4:
 		a, b, c = sys.argv[1:]
 		print("Mixing %s and %s, output will be %s" % (a, b, c))
 		mix_files(a, b, c)
-
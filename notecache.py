@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+
+# Note waveform cache shared by all renders in a process (PySynth B and E)
+
+# Entries are keyed by (engine, note, transpose, sample rate, engine
+# parameters...) and hold the raw note waveform before articulation
+# and volume are applied, so they can be reused by any later song.
+# The engine part of the key should include a version number that is
+# bumped whenever the synthesis changes.
+
+# If a disk cache is configured (see diskcache.py), memory misses are
+# looked up there and new waveforms are written to it as well.
+
+import diskcache
+from lrucache import LRUCache
+
+cache = LRUCache(256 * 2**20)
+
+def get(key):
+	"Return the cached waveform for key, or None."
+	wave = cache.get(key)
+	if wave is None:
+		dc = diskcache.get_cache()
+		if dc is not None:
+			wave = dc.get(key)
+			if wave is not None:
+				cache.put(key, wave)
+	return wave
+
+def put(key, wave):
+	"Cache a note waveform; the array is made read-only."
+	wave.flags.writeable = False
+	cache.put(key, wave)
+	dc = diskcache.get_cache()
+	if dc is not None:
+		dc.put(key, wave)
+
+def set_limit(max_bytes):
+	"Change the memory ceiling of the cache (in bytes)."
+	cache.set_limit(max_bytes)
+
+def stats():
+	"Return hit, miss, eviction and byte statistics."
+	return cache.stats()
+
+def clear():
+	"Empty the cache."
+	cache.clear()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+# Render MIDI input with the multi_synth voice engine (polysynth.py)
+#   without a sound card or MIDI device, and measure its speed
+
+# Usage:
+
+# python offline_synth.py file.mid [file.wav] [--maxpoly=N] [--bsize=N] [--tracks=1,2]
+
+# The engine is driven exactly as in multi_synth.py: a stand-in stream
+# calls its PyAudio callback block by block and note events are queued
+# with timestamps, but a virtual clock is used, so rendering runs as fast
+# as possible. As in the live synth, events are played up to one block late.
+
+from __future__ import division
+
+import sys, time
+import numpy as np
+import polysynth, wavio
+
+class OfflineStream(object):
+	"""Stand-in for a PyAudio output stream with a callback
+
+	time is the virtual time in seconds; pass clock() to the engine."""
+
+	def __init__(self, callback, rate = 44100, frames_per_buffer = 128):
+		self.callback = callback
+		self.rate = rate
+		self.frames_per_buffer = frames_per_buffer
+		self.time = 0.
+
+	def clock(self):
+		return self.time
+
+	def run(self, frames, before_block = None):
+		"""Pull frames samples from the callback, return them as int16.
+
+		before_block(t) is called at the start of each block (to queue
+		the events up to virtual time t)."""
+		out = np.zeros(frames, np.int16)
+		pos = 0
+		while pos < frames:
+			n = min(self.frames_per_buffer, frames - pos)
+			if before_block:
+				before_block(self.time)
+			data, flag = self.callback(None, n, {}, 0)
+			out[pos:pos+n] = np.frombuffer(data, np.int16)
+			pos += n
+			self.time += n / self.rate
+		return out
+
+def midi_messages(m, tracks = None):
+	"""Return a list of (time, "on"/"off", key) for the tracks of a readmidi.MidiFile.
+
+	Times are in seconds; all tracks are used by default."""
+	if tracks is None:
+		tracks = range(len(m.notes))
+	msgs = []
+	for t in tracks:
+		ev = m.events(t)
+		msgs += [(float(e['start']), "on", int(e['pitch'])) for e in ev]
+		msgs += [(float(e['start'] + e['dur']), "off", int(e['pitch'])) for e in ev]
+	return timed_messages(msgs)
+
+def timed_messages(msgs):
+	"""Convert mido-style messages (with time = delta seconds, as from
+	iterating over a mido.MidiFile) to a list of (time, "on"/"off", key).
+
+	(time, "on"/"off", key) tuples are passed through. The result is
+	sorted by time, with note offs first, so a repeated note is not cut
+	off at once."""
+	out = []
+	t = 0.
+	for msg in msgs:
+		if isinstance(msg, tuple):
+			out.append(msg)
+			continue
+		t += msg.time
+		if msg.type == "note_on" and msg.velocity > 0:
+			out.append((t, "on", msg.note))
+		elif msg.type in ("note_on", "note_off"):
+			out.append((t, "off", msg.note))
+	out.sort(key = lambda x: (x[0], x[1] == "on"))
+	return out
+
+def render(msgs, rate = 44100, bsize = 128, maxpoly = 8, volume = 3000,
+		sustain = False, tail = 1., monitor = None):
+	"""Render a readmidi.MidiFile or a message list (see timed_messages).
+
+	Returns (int16 samples, real-time factor), where the real-time factor
+	is the length of the audio divided by the time it took to render.
+	The audio goes on for tail seconds after the last event."""
+	if hasattr(msgs, "events"):
+		msgs = midi_messages(msgs)
+	else:
+		msgs = timed_messages(msgs)
+	stream = OfflineStream(None, rate, bsize)
+	engine = polysynth.Engine(rate, maxpoly, volume, sustain, bsize,
+		clock = stream.clock, monitor = monitor)
+	stream.callback = engine.callback
+	state = {'next': 0}
+
+	def before_block(t):
+		i = state['next']
+		while i < len(msgs) and msgs[i][0] <= t:
+			tm, kind, key = msgs[i]
+			if kind == "on":
+				engine.note_on(key, tm)
+			else:
+				engine.note_off(key, tm)
+			i += 1
+		state['next'] = i
+
+	length = max([x[0] for x in msgs] + [0.]) + tail
+	frames = int(length * rate)
+	t0 = time.perf_counter()
+	out = stream.run(frames, before_block)
+	elapsed = time.perf_counter() - t0
+	return out, frames / rate / max(elapsed, 1e-9)
+
+if __name__ == "__main__":
+	import readmidi
+	opts = [a for a in sys.argv[1:] if a.startswith("--")]
+	args = [a for a in sys.argv[1:] if not a.startswith("--")]
+	if not args:
+		print("Usage: offline_synth.py file.mid [file.wav] [--maxpoly=N] [--bsize=N] [--tracks=1,2]")
+		sys.exit(1)
+	maxpoly, bsize, tracks = 8, 128, None
+	for a in opts:
+		if a.startswith("--maxpoly="):
+			maxpoly = int(a[10:])
+		elif a.startswith("--bsize="):
+			bsize = int(a[8:])
+		elif a.startswith("--tracks="):
+			tracks = [int(t) for t in a[9:].split(",")]
+	m = readmidi.MidiFile(args[0])
+	data, rtf = render(midi_messages(m, tracks), bsize = bsize, maxpoly = maxpoly)
+	print("%.2f s of audio, %u voices, block size %u: %.1fx real time" % (
+		len(data) / 44100, maxpoly, bsize, rtf))
+	if len(args) > 1:
+		print("Writing to file", args[1])
+		wavio.write_wav(args[1], data / 32000., 44100)
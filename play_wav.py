@@ -9,6 +9,7 @@ import wave
 import os
 import sys
 import string
+import tempfile
 
 pyaudioFound = False
 tkSnackFound = False
@@ -48,27 +49,51 @@ class Sound:
 			else:
 				self.play_media(mediaFile)
 
+	def playArray(self, data, rate, repeat = 0):
+		''' Play samples returned by one of the render() functions.'''
+
+		import wavio
+		if pyaudioFound:
+			import numpy as np
+			x = np.clip(np.round(32000. * np.asarray(data, dtype = float)), -32768, 32767)
+			pcm = x.astype('<i2').tobytes()
+			chann = 1 if x.ndim < 2 else x.shape[1]
+			for n in range(repeat + 1):
+				self.play_pyaudio_data(pcm, 2, chann, rate)
+		else:
+			# the other backends can only play files
+			fd, fn = tempfile.mkstemp(suffix = '.wav')
+			os.close(fd)
+			try:
+				wavio.write_wav(fn, data, rate)
+				self.playFile(fn, repeat)
+			finally:
+				os.remove(fn)
+
 	def play_pyaudio(self, mediaFile):
 		''' Use pyaudio backend to play the .wav.'''
 
-		chunk = 1024
 		wf = wave.open(mediaFile, 'rb')
+		self.play_pyaudio_data(wf.readframes(wf.getnframes()),
+			wf.getsampwidth(), wf.getnchannels(), wf.getframerate())
+		wf.close()
+
+	def play_pyaudio_data(self, data, width, channels, rate):
+		''' Play raw PCM data with pyaudio.'''
+
+		chunk = 1024 * width * channels
 		p = pyaudio.PyAudio()
 
 		# open stream
 		stream = p.open(format =
-	         		p.get_format_from_width(wf.getsampwidth()),
-        		        channels = wf.getnchannels(),
-		                rate = wf.getframerate(),
+	         		p.get_format_from_width(width),
+        		        channels = channels,
+		                rate = rate,
 		                output = True)
 
-		# read data
-		data = wf.readframes(chunk)
-
 		# play stream
-		while data != b'':
-			stream.write(data)
-			data = wf.readframes(chunk)
+		for n in range(0, len(data), chunk):
+			stream.write(data[n:n+chunk])
 
 		stream.stop_stream()
 		stream.close()
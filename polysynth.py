@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+
+# Voice engine of the polyphonic MIDI synthesizer (multi_synth.py)
+
+# The engine does no device I/O: note events go in through note_on(),
+# note_off() or on_message() (a mido input callback) and audio comes out
+# of callback(), which has the signature of a PyAudio stream callback.
+# Event times come from the clock function, time.perf_counter by default;
+# offline_synth.py passes a virtual clock to render without a sound card.
+
+from __future__ import division
+
+import math, time
+from collections import deque
+import numpy as np
+
+# return value for the callback (same as pyaudio.paContinue)
+PA_CONTINUE = 0
+
+def note_params(key, rate = 44100):
+	"Return (frequency, amplitude loss factor, harmonic factor) for a MIDI key number."
+	# get note frequency in Hz
+	freq = 440 * 2**((key - 69) / 12)
+
+	# get amplitude loss factor per sample
+	#   (higher frequencies decay more quickly)
+	a_min, a_max, a_sel = math.log(21), math.log(108), math.log(key)
+	lossfac = 50000 - 49000 * ((a_sel - a_min) / (a_max - a_min))
+	lossfac *= rate / 44100
+	amp_loss = 1 - 1 / lossfac
+
+	# get harmonic content factor (like PySynth A)
+	#   - strong harmonics in lower octaves
+	#   - no harmonics in higher octaves
+	lf_fac = (math.log(freq) - 3) / 4
+	if lf_fac > 1:
+		harm = 0
+	else:
+		harm = 2 * (1 - lf_fac)
+	return freq, amp_loss, harm
+
+class VoicePool(object):
+	"""Fixed number of voices stored as parallel arrays
+
+	A new note takes the first free voice or, if all are busy, the
+	quietest one. Voices that have gone almost silent are freed while
+	rendering, so the work per block only depends on the pool size."""
+
+	def __init__(self, size, rate = 44100, sustain = False):
+		self.rate = rate
+		self.sustain = sustain
+		self.phase = np.zeros(size)     # current oscillator phase
+		self.freq = np.zeros(size)      # frequency in Hz
+		self.amp = np.zeros(size)       # current amplitude
+		self.loss = np.zeros(size)      # amplitude loss factor per sample
+		self.key = np.zeros(size, int)  # MIDI key number
+		self.harm = np.zeros(size)      # harmonic content factor
+		self.active = np.zeros(size, bool)
+
+	def note_on(self, key):
+		free = np.flatnonzero(~self.active)
+		if len(free):
+			i = free[0]
+		else:
+			i = np.argmin(self.amp)
+		self.freq[i], self.loss[i], self.harm[i] = note_params(key, self.rate)
+		self.phase[i] = 0
+		self.amp[i] = 1
+		self.key[i] = key
+		self.active[i] = True
+
+	def note_off(self, key):
+		# increase amplitude loss of note when note_off event happens
+		if not self.sustain:
+			off = self.active & (self.key == key)
+			self.loss[off] = self.loss[off]**6
+
+	def playing(self):
+		"Return the number of sounding voices."
+		return int(self.active.sum())
+
+	def render(self, n):
+		"Return n samples of all active voices and advance them."
+		idx = np.flatnonzero(self.active)
+		if not len(idx):
+			return np.zeros(n)
+		k = np.arange(n)
+		delt = 2 * math.pi / self.rate * self.freq[idx]
+		loss = self.loss[idx]
+		ph = self.phase[idx, None] + delt[:, None] * k
+		amp = self.amp[idx, None] * loss[:, None]**k
+		harm = self.harm[idx, None]
+		v = (amp * (np.sin(ph) + .5 * harm * np.sin(2 * ph) + .25 * harm * np.sin(4 * ph))).sum(axis = 0)
+		self.phase[idx] = (self.phase[idx] + n * delt) % (2 * math.pi)
+		self.amp[idx] *= loss**n
+		# free voices that have gone almost silent
+		self.active[idx] = self.amp[idx] > .001
+		return v
+
+class Engine(object):
+	"""Polyphonic synthesizer driven by timestamped note events
+
+	Events that arrived since the previous callback are played at the
+	same offset into the current block, so the latency is always one
+	block and notes are not moved to block boundaries. monitor may be
+	an rtstats.PerfMonitor that gets the timing of every block.
+
+	voices is a VoicePool(maxpoly, rate, sustain) by default; any object
+	with the note_on(), note_off(), render() and playing() methods of
+	VoicePool can be used instead (midi_synth.py has a monophonic one)."""
+
+	def __init__(self, rate = 44100, maxpoly = 8, volume = 3000, sustain = False,
+			bsize = 128, clock = time.perf_counter, monitor = None, voices = None):
+		self.rate = rate
+		self.volume = volume
+		self.clock = clock
+		self.monitor = monitor
+		if voices is None:
+			voices = VoicePool(maxpoly, rate, sustain)
+		self.voices = voices
+		# (arrival time, "on"/"off", key) events; only the audio callback
+		#   changes the voices (deque append and popleft are atomic, so
+		#   no lock is needed)
+		self.pending = deque()
+		# clock() time of the previous audio callback
+		self.last_block = None
+		# output buffers, reused for every block
+		self.mixbuf = np.zeros(bsize)
+		self.outbuf = np.zeros(bsize, np.int16)
+
+	def note_on(self, key, t = None):
+		self.pending.append((self.clock() if t is None else t, "on", key))
+
+	def note_off(self, key, t = None):
+		self.pending.append((self.clock() if t is None else t, "off", key))
+
+	def on_message(self, msg):
+		"MIDI input callback for mido messages (runs in the mido thread)."
+		if msg.type == "note_on":
+			if msg.velocity == 0:
+				# turn note off (if velocity = 0)
+				self.note_off(msg.note)
+			else:
+				self.note_on(msg.note)
+
+		if msg.type == "note_off":
+			self.note_off(msg.note)
+
+	def event_offset(self, t, start, pos, frame_count):
+		"Sample offset in the current block for an event that arrived at time t."
+		return min(frame_count - 1, max(pos, int(round((t - start) * self.rate))))
+
+	def process(self, frame_count, status = 0):
+		"Render the next block, return it as an int16 array (valid until the next call)."
+		t0 = time.perf_counter()
+		now = self.clock()
+		start = now if self.last_block is None else self.last_block
+		self.last_block = now
+		if len(self.outbuf) < frame_count:
+			self.mixbuf = np.zeros(frame_count)
+			self.outbuf = np.zeros(frame_count, np.int16)
+		mix = self.mixbuf[:frame_count]
+		pos = 0
+		latency = float('nan')
+		while self.pending and self.pending[0][0] <= now:
+			t, kind, key = self.pending.popleft()
+			off = self.event_offset(t, start, pos, frame_count)
+			if self.monitor:
+				# time from arrival until the event is written to the output
+				#   (the latency of the audio device itself is not included)
+				lat = now + off / self.rate - t
+				if not lat <= latency:
+					latency = lat
+			if off > pos:
+				mix[pos:off] = self.voices.render(off - pos)
+				pos = off
+			if kind == "on":
+				self.voices.note_on(key)
+			else:
+				self.voices.note_off(key)
+		mix[pos:] = self.voices.render(frame_count - pos)
+		out = self.outbuf[:frame_count]
+		out[:] = np.clip(np.round(self.volume * mix), -32768, 32767)
+		if self.monitor:
+			self.monitor.record(t0, time.perf_counter(), frame_count,
+				self.voices.playing(), status, latency)
+		return out
+
+	def callback(self, in_data, frame_count, time_info, status):
+		"PyAudio stream callback."
+		# (pyaudio only accepts bytes here, so this is the one copy per block)
+		return self.process(frame_count, status).tobytes(), PA_CONTINUE
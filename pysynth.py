@@ -62,70 +62,24 @@ pitchhz, keynum = getfreq(pr = True)
 harm_max = 4.
 ##########################################################################
 
-import wave, math, struct
+import math
+import wavio
 from mixfiles import mix_files
 
-def make_wav(song,bpm=120,transpose=0,pause=.05,boost=1.1,repeat=0,fn="out.wav", silent=False):
-	f=wave.open(fn,'w')
-
-	f.setnchannels(1)
-	f.setsampwidth(2)
-	f.setframerate(44100)
-	f.setcomptype('NONE','Not Compressed')
+# NumPy is optional for PySynth A: if it is available, whole notes are
+# computed as arrays, otherwise the original per-sample loop is used.
+try:
+	import numpy as np
+except ImportError:
+	np = None
 
+def song_notes(song, bpm, transpose, boost, repeat, silent):
+	"Yield (frequency in Hz, length in samples, volume); frequency is None for rests."
 	bpmfac = 120./bpm
 
 	def length(l):
 		return 88200./l*bpmfac
 
-	def waves2(hz,l):
-		a=44100./hz
-		b=float(l)/44100.*hz
-		return [a,round(b)]
-
-	def sixteenbit(x):
-		return struct.pack('h', round(32000*x))
-
-	def asin(x):
-		return math.sin(2.*math.pi*x)
-
-	def render2(a,b,vol):
-		b2 = (1.-pause)*b
-		l=waves2(a,b2)
-		ow=b''
-		q=int(l[0]*l[1])
-
-		# harmonics are frequency-dependent:
-		lf = math.log(a)
-		lf_fac = (lf-3.) / harm_max
-		if lf_fac > 1: harm = 0
-		else: harm = 2. * (1-lf_fac)
-		decay = 2. / lf
-		t = (lf-3.) / (8.5-3.)
-		volfac = 1. + .8 * t * math.cos(math.pi/5.3*(lf-3.))
-
-		for x in range(q):
-			fac=1.
-			if x<100: fac=x/80.
-			if 100<=x<300: fac=1.25-(x-100)/800.
-			if x>q-400: fac=1.-((x-q+400)/400.)
-			s = float(x)/float(q)
-			dfac =  1. - s + s * decay
-			ow=ow+sixteenbit((asin(float(x)/l[0])
-				+harm*asin(float(x)/(l[0]/2.))
-				+.5*harm*asin(float(x)/(l[0]/4.)))/4.*fac*vol*dfac*volfac)
-		fill = max(int(ex_pos - curpos - q), 0)
-		f.writeframesraw((ow)+(sixteenbit(0)*fill))
-		return q + fill
-
-	##########################################################################
-	# Write to output file (in WAV format)
-	##########################################################################
-
-	if silent == False:
-		print("Writing to file", fn)
-	curpos = 0
-	ex_pos = 0.
 	for rp in range(repeat+1):
 		for nn, x in enumerate(song):
 			if not nn % 4 and silent == False:
@@ -146,17 +100,102 @@ def make_wav(song,bpm=120,transpose=0,pause=.05,boost=1.1,repeat=0,fn="out.wav",
 					b=length(-2.*x[1]/3.)
 				else:
 					b=length(x[1])
-				ex_pos = ex_pos + b
-				curpos = curpos + render2(a,b,vol)
+				yield a, b, vol
 
 			if x[0]=='r':
-				b=length(x[1])
-				ex_pos = ex_pos + b
-				f.writeframesraw(sixteenbit(0)*int(b))
-				curpos = curpos + int(b)
+				yield None, length(x[1]), 0.
+
+def note_params(a):
+	"Harmonic content, decay and volume correction for frequency a."
+	# harmonics are frequency-dependent:
+	lf = math.log(a)
+	lf_fac = (lf-3.) / harm_max
+	if lf_fac > 1: harm = 0
+	else: harm = 2. * (1-lf_fac)
+	decay = 2. / lf
+	t = (lf-3.) / (8.5-3.)
+	volfac = 1. + .8 * t * math.cos(math.pi/5.3*(lf-3.))
+	return harm, decay, volfac
+
+def render_note(a, q, l0, vol):
+	"Compute a note of q samples and period l0 one sample at a time."
+	harm, decay, volfac = note_params(a)
 
-	f.writeframes(b'')
-	f.close()
+	def asin(x):
+		return math.sin(2.*math.pi*x)
+
+	ow = []
+	for x in range(q):
+		fac=1.
+		if x<100: fac=x/80.
+		if 100<=x<300: fac=1.25-(x-100)/800.
+		if x>q-400: fac=1.-((x-q+400)/400.)
+		s = float(x)/float(q)
+		dfac =  1. - s + s * decay
+		ow.append((asin(float(x)/l0)
+			+harm*asin(float(x)/(l0/2.))
+			+.5*harm*asin(float(x)/(l0/4.)))/4.*fac*vol*dfac*volfac)
+	return ow
+
+def render_note_np(a, q, l0, vol):
+	"Same as render_note, but computes the whole note with NumPy."
+	harm, decay, volfac = note_params(a)
+
+	x = np.arange(q, dtype = float)
+	# attack, then fade-out over the last 400 samples
+	fac = np.ones(q)
+	fac[:100] = x[:100] / 80.
+	fac[100:300] = 1.25 - (x[100:300] - 100) / 800.
+	tail = x > q - 400
+	fac[tail] = 1. - ((x[tail] - q + 400) / 400.)
+	s = x / float(q)
+	dfac = 1. - s + s * decay
+	return ( np.sin(2. * math.pi * (x / l0))
+		+ harm * np.sin(2. * math.pi * (x / (l0 / 2.)))
+		+ .5 * harm * np.sin(2. * math.pi * (x / (l0 / 4.))) ) / 4. * fac * vol * dfac * volfac
+
+def _pieces(song, bpm, transpose, pause, boost, repeat, silent):
+	"Yield the song as consecutive pieces (arrays, or lists of floats without NumPy)."
+	if np is not None:
+		note, zeros = render_note_np, np.zeros
+	else:
+		note, zeros = render_note, lambda n: [0.] * n
+	curpos = 0
+	ex_pos = 0.
+	for a, b, vol in song_notes(song, bpm, transpose, boost, repeat, silent):
+		ex_pos = ex_pos + b
+		if a is None:
+			yield zeros(int(b))
+			curpos = curpos + int(b)
+			continue
+		b2 = (1.-pause)*b
+		l0 = 44100./a
+		q = int(l0*round(float(b2)/44100.*a))
+		fill = max(int(ex_pos - curpos - q), 0)
+		yield note(a, q, l0, vol)
+		yield zeros(fill)
+		curpos = curpos + q + fill
+
+def _render(song, bpm, transpose, pause, boost, repeat, silent):
+	"Render song to a float64 array (or a list of floats without NumPy)."
+	out = list(_pieces(song, bpm, transpose, pause, boost, repeat, silent))
+	if np is not None:
+		return np.concatenate([np.zeros(0)] + out)
+	return [v for x in out for v in x]
+
+def render(song,bpm=120,transpose=0,pause=.05,boost=1.1,repeat=0,silent=False):
+	"Render song in memory, return (float32 samples with 1.0 = full scale, sample rate)."
+	return np.asarray(_render(song, bpm, transpose, pause, boost, repeat, silent), np.float32), 44100
+
+def make_wav(song,bpm=120,transpose=0,pause=.05,boost=1.1,repeat=0,fn="out.wav", silent=False):
+	##########################################################################
+	# Write to output file (in WAV format)
+	##########################################################################
+
+	if silent == False:
+		print("Writing to file", fn)
+	# written note by note, so memory use does not grow with the song
+	wavio.write_wav_blocks(fn, _pieces(song, bpm, transpose, pause, boost, repeat, silent), 44100)
 	print()
 
 ##########################################################################
@@ -1,7 +1,12 @@
 import logging
 import math
-import struct 
-import wave
+
+import wavio
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 LOG = logging.getLogger("pysynth_beeper")
 SAMPLING_RATE = 44100
@@ -14,14 +19,8 @@ for k in range(88):
     note = '%s%u' % (keys_s[k % 12], oct)
     PITCHHZ[note] = freq
 
-def make_wav(song, tempo=120, transpose=0, fn="out.wav"):
-    f = wave.open(fn, 'w')
-
-    f.setnchannels(1)
-    f.setsampwidth(2)
-    f.setframerate(SAMPLING_RATE)
-    f.setcomptype('NONE', 'Not Compressed')
-
+def _pieces(song, tempo, transpose):
+    """Yield the song as lists of float samples (1.0 = full scale), one per note."""
     # Define a waveform that looks something like this
     # \        /
     #__\_____ /__
@@ -38,10 +37,7 @@ def make_wav(song, tempo=120, transpose=0, fn="out.wav"):
     full_notes_per_second = float(tempo) / 60 / 4 
     full_note_in_samples = SAMPLING_RATE / full_notes_per_second
 
-    def sixteenbit(sample):
-        return struct.pack('h', round(32000 * sample))
 
-    
     def beep_single_period(period):
         asin = lambda x: math.sin(2. * math.pi * x)
         
@@ -63,51 +59,55 @@ def make_wav(song, tempo=120, transpose=0, fn="out.wav"):
             # Put both samples together, apply fadein/fadeout
             level = (level1 + level2) / 2
             period_waveform.append(level)
-            #period_waveform_packed.append(sixteenbit(level))    
     
-        return period_waveform, b"".join(sixteenbit(l) for l in period_waveform)
+        return period_waveform
     
     def beep(freq, duration, sink):
-        ow = b""
-
         period = int(SAMPLING_RATE / 4 / freq)
-        period_waveform, period_waveform_packed = beep_single_period(period)
+        period_waveform = beep_single_period(period)
 
         x = 0 
         while x < duration:
             if x < 100 or duration - x < 100:
                 # At borders we do fade in and fade out
                 fade_multiplier = min(x, duration - x) / 100.0
-                ow += sixteenbit(period_waveform[x % period] * fade_multiplier)
+                sink.append(period_waveform[x % period] * fade_multiplier)
                 x += 1
             else:
                 if x % period == 0:
                     # Optimization:
                     # We're aligned with waveform, can fill ow in batches!
                     while x + period + 100 < duration:
-                        ow += period_waveform_packed
+                        sink.extend(period_waveform)
                         x += period
 
                 # Go sample-by-sample
-                ow += sixteenbit(period_waveform[x % period])
+                sink.append(period_waveform[x % period])
                 x += 1
 
-        sink.writeframesraw(ow)
-
     def silence(duration, sink):
-        sink.writeframesraw(sixteenbit(0) * int(duration))
+        sink.extend([0.] * int(duration))
 
     for note_pitch, note_duration in song:
         # note_duration is 1, 2, 4, 8, ... and actually means 1, 1/2, 1/4, ...
         duration = int(full_note_in_samples / note_duration) 
+        out = []
         
         if note_pitch == "r":
             LOG.debug("Silence for %d samples" % duration)
-            silence(duration, f)
+            silence(duration, out)
         else:
             freq = PITCHHZ[note_pitch]
             freq *= 2 ** transpose
             LOG.debug("%d Hz for %d samples" % (freq, duration))
-            beep(freq, duration, f)
+            beep(freq, duration, out)
+        yield out
 
-    f.close()
+def render(song, tempo=120, transpose=0):
+    """Render song in memory, return (float32 samples, sample rate)."""
+    pieces = [np.array(x, np.float32) for x in _pieces(song, tempo, transpose)]
+    return np.concatenate([np.zeros(0, np.float32)] + pieces), SAMPLING_RATE
+
+def make_wav(song, tempo=120, transpose=0, fn="out.wav"):
+    # written note by note, so memory use does not grow with the song
+    wavio.write_wav_blocks(fn, _pieces(song, tempo, transpose), SAMPLING_RATE)
@@ -30,12 +30,15 @@
 # 5.33 = -8 = dotted eighth
 """
 
-import wave, struct
 import numpy as np
-from math import sin, cos, pi, log, exp
+from math import pi, log, exp
+import wavio
+import blockstream
+import events
 from mixfiles import mix_files
 from demosongs import *
 from mkfreq import getfreq
+import notecache
 
 pitchhz, keynum = getfreq()
 
@@ -116,24 +119,15 @@ for h2 in range(88):
 # Suggested range: between 3. and 5., depending on the frequency response
 #  of speakers/headphones used
 harm_max = 5.
-##########################################################################
-
-def make_wav(song,bpm=120,transpose=0,leg_stac=.9,boost=1.1,repeat=0,fn="out.wav", silent=False):
-	data = []
-	note_cache = {}
-	cache_this = {}
-
-	f=wave.open(fn,'w')
 
-	f.setnchannels(1)
-	f.setsampwidth(2)
-	f.setframerate(44100)
-	f.setcomptype('NONE','Not Compressed')
-
-	bpmfac = 120./bpm
+# Version of the note synthesis, part of the note cache key
+#   (bump when render2 changes the raw note waveform)
+cache_version = 1
+##########################################################################
 
-	def length(l):
-	    return 88200./l*bpmfac
+def _synth(transpose, leg_stac):
+	"Return render2(a, b, vol, knum, note), which synthesizes one note of b samples."
+	shape_lens = {}
 
 	def waves2(hz,l):
 	    a=44100./hz
@@ -150,60 +144,53 @@ def make_wav(song,bpm=120,transpose=0,leg_stac=.9,boost=1.1,repeat=0,fn="out.wav
 	for n in range(900):
 		decay[n] = exp(linint(( (0,log(3)), (3,log(5)), (5, log(1.)), (6, log(.8)), (9,log(.1)) ), n/100.))
 
-	def zz(a):
-		for q in range(len(a)):
-			if a[q] < 0: a[q] = 0
-
-	def render2(a, b, vol, pos, knum, note):
+	def render2(a, b, vol, knum, note):
 		l=waves2(a, b)
 		q=int(l[0]*l[1])
 		lf = log(a)
 		snd_len = max(int(3.1*q), 44100)
 
+		# only synthesize as many samples as this note needs; a cached
+		#   note is extended if a longer one is requested later
+		#   (the envelope shape keeps the length of the first rendering)
+		shape_len = shape_lens.setdefault(note, snd_len)
+		key = ('e', cache_version, note, transpose, 44100, shape_len)
+		new = notecache.get(key)
 		raw_note = 12*44100
-		if note not in list(note_cache.keys()):
-			x2 = np.arange(raw_note)
+		if snd_len > raw_note:
+			print("Warning, note too long:", snd_len, raw_note)
+			snd_len = raw_note
+		if new is None or len(new) < snd_len:
+			x2 = np.arange(0 if new is None else len(new), snd_len)
 			sina = 2. * pi * x2 / float(l[0])
 			sina14 = 14. * 2. * pi * x2 / float(l[0])
-			amp1 = 1. - (x2/snd_len)
-			amp2 = 1. - (4*x2/snd_len)
-			amp_3to6 = 1. - (.25*x2/snd_len)
-			zz(amp1)
-			zz(amp2)
-			zz(amp_3to6)
-			new = (
+			amp1 = np.maximum(1. - (x2/shape_len), 0)
+			amp2 = np.maximum(1. - (4*x2/shape_len), 0)
+			amp_3to6 = np.maximum(1. - (.25*x2/shape_len), 0)
+			ext = (
 				amp1 * np.sin(sina+.58*amp2*np.sin(sina14))
 	            	  + amp_3to6 * np.sin(sina+.89*amp_3to6*np.sin(sina))
 	           	   + amp_3to6 * np.sin(sina+.79*amp_3to6*np.sin(sina))
 		   	   )
-			new *= np.exp(-x2/decay[int(lf*100)]/44100.)
-			if cache_this[note] > 1:
-				note_cache[note] = new.copy()
-		else:
-			new = note_cache[note].copy()
+			ext *= np.exp(-x2/decay[int(lf*100)]/44100.)
+			new = ext if new is None else np.concatenate((new, ext))
+			notecache.put(key, new)
+		new = new[:snd_len].copy()
 		dec_ind = int(leg_stac*q)
-		new[dec_ind:] *= np.exp(-np.arange(raw_note-dec_ind)/3000.)
-		if snd_len > raw_note:
-			print("Warning, note too long:", snd_len, raw_note)
-			snd_len = raw_note
-		data[pos:pos+snd_len] += ( new[:snd_len] * vol  )
+		new[dec_ind:] *= np.exp(-np.arange(snd_len-dec_ind)/3000.)
+		return ( new * vol  )
 
-	ex_pos = 0.
-	t_len = 0
-	for y, x in song:
-		if x < 0:
-			t_len+=length(-2.*x/3.)
-		else:
-			t_len+=length(x)
-		if y[-1] == '*':
-			y = y[:-1]
-		if not y[-1].isdigit():
-			y += '4'
-		cache_this[y] = cache_this.get(y, 0) + 1
-	#print "Note frequencies in song:", cache_this
-	data = np.zeros(int((repeat+1)*t_len + 441000))
-	#print len(data)/44100., "s allocated"
+	return render2
+
+def _notes(song, bpm, transpose, leg_stac, boost, repeat, silent):
+	"Yield (position, waveform) for each note, then (end position, None)."
+	render2 = _synth(transpose, leg_stac)
+	bpmfac = 120./bpm
+
+	def length(l):
+	    return 88200./l*bpmfac
 
+	ex_pos = 0.
 	for rp in range(repeat+1):
 		for nn, x in enumerate(song):
 			if not nn % 4 and silent == False:
@@ -225,25 +212,45 @@ def make_wav(song,bpm=120,transpose=0,leg_stac=.9,boost=1.1,repeat=0,fn="out.wav
 				else:
 					b=length(x[1])
 
-				render2(a, b, vol, int(ex_pos), kn, note)
+				yield int(ex_pos), render2(a, b, vol, kn, note)
 				ex_pos = ex_pos + b
 
 			if x[0]=='r':
 				b=length(x[1])
 				ex_pos = ex_pos + b
 
+	yield ex_pos, None
+
+def _render(song, bpm, transpose, leg_stac, boost, repeat, silent):
+	"Render song to a float64 array (1.0 = full scale)."
+	data, out_len = blockstream.overlap_add(_notes(song, bpm, transpose, leg_stac, boost, repeat, silent), 44100)
+	return blockstream.normalize(data, out_len)
+
+def render(song,bpm=120,transpose=0,leg_stac=.9,boost=1.1,repeat=0, silent=False):
+	"Render song in memory, return (float32 samples, sample rate)."
+	return _render(song, bpm, transpose, leg_stac, boost, repeat, silent).astype(np.float32), 44100
+
+def iter_blocks(song,bpm=120,transpose=0,leg_stac=.9,boost=1.1,repeat=0,silent=False,block_size=8192,gain=None):
+	"""Yield the song as int16 blocks of block_size samples, for songs
+	too long to keep in memory (see blockstream.iter_blocks)."""
+	return blockstream.iter_blocks(_notes(song, bpm, transpose, leg_stac, boost, repeat, silent), 44100, block_size, gain)
+
+def render_events(ev,transpose=0,leg_stac=.9,silent=False):
+	"""Render overlapping notes from an event array (see events.py),
+	return (float32 samples, sample rate)."""
+	notes = events.notes(ev, _synth(transpose, leg_stac), 44100, transpose, silent)
+	data, out_len = blockstream.overlap_add(notes, 44100)
+	return blockstream.normalize(data, out_len).astype(np.float32), 44100
+
+def make_wav(song,bpm=120,transpose=0,leg_stac=.9,boost=1.1,repeat=0,fn="out.wav", silent=False):
+	data = _render(song, bpm, transpose, leg_stac, boost, repeat, silent)
+
 	##########################################################################
 	# Write to output file (in WAV format)
 	##########################################################################
 	if silent == False:
 		print("Writing to file", fn)
-
-	data = data / (data.max() * 2.)
-	out_len = int(2. * 44100. + ex_pos+.5)
-	data2 = np.zeros(out_len, np.short)
-	data2[:] = 32000. * data[:out_len]
-	f.writeframes(data2.tostring())
-	f.close()
+	wavio.write_wav(fn, data, 44100, rnd = False)
 	print()
 
 ##########################################################################
@@ -32,7 +32,8 @@ from __future__ import division
 from demosongs import *
 from mkfreq import getfreq
 
-pitchhz, keynum = getfreq(pr = True)
+# (the frequency table is printed when subsynth imports pysynth)
+pitchhz, keynum = getfreq()
 
 ##########################################################################
 #### Main program starts below
@@ -55,104 +56,20 @@ pitchhz, keynum = getfreq(pr = True)
 #fn = 'pysynth_output.wav'
 ##########################################################################
 
-import wave, math, struct
 from mixfiles import mix_files
+import subsynth
 
 # set up wavetable for triangle wave
-wt = []
+wt = subsynth.triangle_table()
 
-#   number of samples
-wave_l1 = 2048
-
-wave_l2 = wave_l1 // 2
-wave_l3 = wave_l1 // 4
-
-for i in range(wave_l1):
-	xt = (i - wave_l3) % wave_l1
-	if xt < wave_l2:
-		wtri = 1 - 2 * xt / wave_l2
-	else:
-		wtri = -1 + 2 * (xt - wave_l2) / wave_l2
-	wt.append(wtri)
+def render(song,bpm=120,transpose=0,pause=.05,boost=1.1,repeat=0, silent=False):
+	"Render song in memory, return (float32 samples, sample rate)."
+	return subsynth.render(song, subsynth.wavetable_osc(wt), 5, .8, bpm = bpm, transpose = transpose,
+		pause = pause, boost = boost, repeat = repeat, silent = silent)
 
 def make_wav(song,bpm=120,transpose=0,pause=.05,boost=1.1,repeat=0,fn="out.wav", silent=False):
-	f=wave.open(fn,'w')
-
-	f.setnchannels(1)
-	f.setsampwidth(2)
-	f.setframerate(44100)
-	f.setcomptype('NONE','Not Compressed')
-
-	bpmfac = 120./bpm
-
-	def length(l):
-		return 88200./l*bpmfac
-
-	def waves2(hz,l):
-		a=44100./hz
-		b=float(l)/44100.*hz
-		return [a,round(b)]
-
-	def sixteenbit(x):
-		return struct.pack('h', round(32000*x))
-
-	def render2(a,b,vol):
-		b2 = (1.-pause)*b
-		l=waves2(a,b2)
-		ow=b''
-		q=int(l[0]*l[1])
-		sp = 0
-		fade = 1
-		for x in range(q):
-			if q - x < 100: fade = (q - x) / 100.
-			p = 2 * math.pi * x / 44100 * a
-			pind = int((p % (2 * math.pi)) / (2 * math.pi) * wave_l1)
-			sp += (wt[pind] - sp) / 5
-			ow=ow+sixteenbit(.8 * fade * vol * sp)
-		fill = max(int(ex_pos - curpos - q), 0)
-		f.writeframesraw((ow)+(sixteenbit(0)*fill))
-		return q + fill
-
-	##########################################################################
-	# Write to output file (in WAV format)
-	##########################################################################
-
-	if silent == False:
-		print("Writing to file", fn)
-	curpos = 0
-	ex_pos = 0.
-	for rp in range(repeat+1):
-		for nn, x in enumerate(song):
-			if not nn % 4 and silent == False:
-				print("[%u/%u]\t" % (nn+1,len(song)))
-			if x[0]!='r':
-				if x[0][-1] == '*':
-					vol = boost
-					note = x[0][:-1]
-				else:
-					vol = 1.
-					note = x[0]
-				try:
-					a=pitchhz[note]
-				except:
-					a=pitchhz[note + '4']	# default to fourth octave
-				a = a * 2**transpose
-				if x[1] < 0:
-					b=length(-2.*x[1]/3.)
-				else:
-					b=length(x[1])
-				ex_pos = ex_pos + b
-				curpos = curpos + render2(a,b,vol)
-
-			if x[0]=='r':
-				b=length(x[1])
-				ex_pos = ex_pos + b
-				f.writeframesraw(sixteenbit(0)*int(b))
-				curpos = curpos + int(b)
-
-	f.writeframes(b'')
-	f.close()
-	print()
+	subsynth.make_wav(song, subsynth.wavetable_osc(wt), 5, .8, bpm = bpm, transpose = transpose,
+		pause = pause, boost = boost, repeat = repeat, fn = fn, silent = silent)
 
 ##########################################################################
 # Synthesize demo songs
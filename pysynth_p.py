@@ -57,17 +57,16 @@ pitchhz, keynum = getfreq(pr = True)
 #fn = 'pysynth_output.wav'
 ##########################################################################
 
-import wave, math, struct
+import wavio
 from mixfiles import mix_files
 
-def make_wav(song,bpm=120,transpose=0,pause=.05,boost=1.1,repeat=0,fn="out.wav", silent=False):
-	f=wave.open(fn,'w')
-
-	f.setnchannels(1)
-	f.setsampwidth(2)
-	f.setframerate(44100)
-	f.setcomptype('NONE','Not Compressed')
+try:
+	import numpy as np
+except ImportError:
+	np = None
 
+def _pieces(song, bpm, transpose, pause, boost, repeat, silent):
+	"Yield the song as consecutive lists of float samples (1.0 = full scale), one per note."
 	bpmfac = 120./bpm
 
 	def length(l):
@@ -78,15 +77,12 @@ def make_wav(song,bpm=120,transpose=0,pause=.05,boost=1.1,repeat=0,fn="out.wav",
 		b=float(l)/44100.*hz
 		return [a,round(b)]
 
-	def sixteenbit(x):
-		return struct.pack('h', round(32000*x))
-
 	def render2(a,b,vol):
 		b2 = (1. - pause) * b
 		l = waves2(a, b2)
-		ow = b''
 		q = int(l[0] * l[1])
 
+		out = []
 		sp = 0
 		fade = 1
 
@@ -94,17 +90,10 @@ def make_wav(song,bpm=120,transpose=0,pause=.05,boost=1.1,repeat=0,fn="out.wav",
 			osc = 2 * random.random() - 1
 			if q - x < 100: fade = (q - x) / 100.
 			sp += (osc - sp) / 10
-			ow = ow + sixteenbit(exp(-x / 1000) * fade * vol * sp)
-		fill = max(int(ex_pos - curpos - q), 0)
-		f.writeframesraw((ow) + (sixteenbit(0) * fill))
-		return q + fill
+			out.append(exp(-x / 1000) * fade * vol * sp)
+		out.extend([0.] * max(int(ex_pos - curpos - q), 0))
+		return out
 
-	##########################################################################
-	# Write to output file (in WAV format)
-	##########################################################################
-
-	if silent == False:
-		print("Writing to file", fn)
 	curpos = 0
 	ex_pos = 0.
 	for rp in range(repeat+1):
@@ -128,16 +117,30 @@ def make_wav(song,bpm=120,transpose=0,pause=.05,boost=1.1,repeat=0,fn="out.wav",
 				else:
 					b=length(x[1])
 				ex_pos = ex_pos + b
-				curpos = curpos + render2(a,b,vol)
+				out = render2(a,b,vol)
+				curpos = curpos + len(out)
+				yield out
 
 			if x[0]=='r':
 				b=length(x[1])
 				ex_pos = ex_pos + b
-				f.writeframesraw(sixteenbit(0)*int(b))
+				yield [0.] * int(b)
 				curpos = curpos + int(b)
 
-	f.writeframes(b'')
-	f.close()
+def render(song,bpm=120,transpose=0,pause=.05,boost=1.1,repeat=0,silent=False):
+	"Render song in memory, return (float32 samples, sample rate)."
+	pieces = _pieces(song, bpm, transpose, pause, boost, repeat, silent)
+	return np.concatenate([np.zeros(0, np.float32)] + [np.array(x, np.float32) for x in pieces]), 44100
+
+def make_wav(song,bpm=120,transpose=0,pause=.05,boost=1.1,repeat=0,fn="out.wav", silent=False):
+	##########################################################################
+	# Write to output file (in WAV format)
+	##########################################################################
+
+	if silent == False:
+		print("Writing to file", fn)
+	# written note by note, so memory use does not grow with the song
+	wavio.write_wav_blocks(fn, _pieces(song, bpm, transpose, pause, boost, repeat, silent), 44100)
 	print()
 
 ##########################################################################
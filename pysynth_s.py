@@ -30,9 +30,11 @@
 # 5.33 = -8 = dotted eighth
 """
 
-import wave, struct
 import numpy as np
-from math import sin, cos, pi, log, exp, floor, ceil
+from math import sin, cos, pi, log, floor, ceil
+import wavio
+import blockstream
+import events
 from mixfiles import mix_files
 from demosongs import *
 from mkfreq import getfreq
@@ -60,6 +62,59 @@ def linint(arr, x):
 	#print lx, ly, ux, uy
 	return (float(x) - lx) / (ux - lx) * (uy - ly) + ly
 
+##########################################################################
+# Karplus-Strong delay line
+##########################################################################
+
+# Both functions take the white noise burst kps1 (non-zero in its first
+# kp_len samples) and return the plucked string signal of the same length.
+# delt is the (fractional) period of the note in samples.
+
+def ks_loop(kps1, kp_len, delt, falloff, sm):
+	"Karplus-Strong string, computed one sample at a time."
+	snd_len = len(kps1)
+	kps2 = np.zeros(snd_len)
+	for t in range(kp_len):
+		kps2[t] = kps1[t:t+sm].mean()
+	li = int(floor(delt))
+	hi = int(ceil(delt))
+	ifac = delt % 1
+	delt2 = delt * (floor(delt) - 1) / floor(delt)
+	ifac2 = delt2 % 1
+	for t in range(hi, snd_len):
+		v1 = ifac * kps2[t-hi]   + (1.-ifac) * kps2[t-li]
+		v2 = ifac2 * kps2[t-hi+1] + (1.-ifac2) * kps2[t-li+1]
+		kps2[t] += .5 * (v1 + v2) * falloff
+	return kps2
+
+def ks_block(kps1, kp_len, delt, falloff, sm):
+	"Karplus-Strong string, computed in blocks of (almost) one period."
+	snd_len = len(kps1)
+	li = int(floor(delt))
+	if li < 2:
+		return ks_loop(kps1, kp_len, delt, falloff, sm)
+	kps2 = np.zeros(snd_len)
+	# moving average of the excitation from a cumulative sum
+	cs = np.concatenate(([0.], np.cumsum(kps1[:kp_len+sm])))
+	t = np.arange(min(kp_len, snd_len))
+	e = np.minimum(t + sm, snd_len)
+	kps2[:len(t)] = (cs[e] - cs[t]) / (e - t)
+	hi = int(ceil(delt))
+	ifac = delt % 1
+	delt2 = delt * (floor(delt) - 1) / floor(delt)
+	ifac2 = delt2 % 1
+	# the recursion looks back at least li - 1 samples,
+	#   so that many samples can be computed at once
+	step = li - 1
+	for t in range(hi, snd_len, step):
+		e = min(t + step, snd_len)
+		v1 = ifac * kps2[t-hi:e-hi] + (1.-ifac) * kps2[t-li:e-li]
+		v2 = ifac2 * kps2[t-hi+1:e-hi+1] + (1.-ifac2) * kps2[t-li+1:e-li+1]
+		kps2[t:e] += .5 * (v1 + v2) * falloff
+	return kps2
+
+ks_engines = {"loop": ks_loop, "block": ks_block}
+
 ##########################################################################
 #### Main program starts below
 ##########################################################################
@@ -80,21 +135,11 @@ def linint(arr, x):
 # Output file name
 #fn = 'pysynth_output.wav'
 
-data = []
-
-def make_wav(song,bpm=120,transpose=0,pause=0.,boost=1.1,repeat=0,fn="out.wav",silent=False):
-	f=wave.open(fn,'w')
-
-	f.setnchannels(1)
-	f.setsampwidth(2)
-	f.setframerate(44100)
-	f.setcomptype('NONE','Not Compressed')
-
-	bpmfac = 120./bpm
-
-	def length(l):
-	    return 88200./l*bpmfac
+# Delay line implementation ("block" or the per-sample "loop")
+# e.g. ks_engine = "block"
 
+def _synth(pause, ks_engine):
+	"Return render2(a, b, vol, knum, note), which synthesizes one note of b samples."
 	def waves2(hz,l):
 	    a=44100./hz
 	    b=float(l)/44100.*hz
@@ -103,7 +148,7 @@ def make_wav(song,bpm=120,transpose=0,pause=0.,boost=1.1,repeat=0,fn="out.wav",s
 	def asin(x):
 	    return sin(2.*pi*x)
 
-	def render2(a, b, vol, pos, knum, note, endamp = .25, sm = 10):
+	def render2(a, b, vol, knum, note, endamp = .25, sm = 10):
 		b2 = (1. - pause) * b
 		l=waves2(a, b2)
 		ow=b''
@@ -120,34 +165,22 @@ def make_wav(song,bpm=120,transpose=0,pause=0.,boost=1.1,repeat=0,fn="out.wav",s
 		ls = np.log(1. + s)
 		kp_len = int(l[0])
 		kps1 = np.zeros(snd_len)
-		kps2 = np.zeros(snd_len)
 		kps1[:kp_len] = np.random.normal(size = kp_len)
-
-		for t in range(kp_len):
-			kps2[t] = kps1[t:t+sm].mean()
-		delt = float(l[0])
-		li = int(floor(delt))
-		hi = int(ceil(delt))
-		ifac = delt % 1
-		delt2 = delt * (floor(delt) - 1) / floor(delt)
-		ifac2 = delt2 % 1
 		falloff = (4./lf*endamp)**(1./l[1])
-		for t in range(hi, snd_len):
-			v1 = ifac * kps2[t-hi]   + (1.-ifac) * kps2[t-li]
-			v2 = ifac2 * kps2[t-hi+1] + (1.-ifac2) * kps2[t-li+1]
-			kps2[t] += .5 * (v1 + v2) * falloff
-		data[pos:pos+snd_len] += kps2*vol*volfac
+		kps2 = ks_engines[ks_engine](kps1, kp_len, float(l[0]), falloff, sm)
+		return kps2*vol*volfac
 
-	ex_pos = 0.
-	t_len = 0
-	for y, x in song:
-		if x < 0:
-			t_len+=length(-2.*x/3.)
-		else:
-			t_len+=length(x)
-	data = np.zeros(int((repeat+1)*t_len + 20 * 44100))
-	#print len(data)/44100., "s allocated"
+	return render2
 
+def _notes(song, bpm, transpose, pause, boost, repeat, silent, ks_engine):
+	"Yield (position, waveform) for each note, then (end position, None)."
+	render2 = _synth(pause, ks_engine)
+	bpmfac = 120./bpm
+
+	def length(l):
+	    return 88200./l*bpmfac
+
+	ex_pos = 0.
 	for rp in range(repeat+1):
 		for nn, x in enumerate(song):
 			if not nn % 4 and silent == False:
@@ -169,25 +202,45 @@ def make_wav(song,bpm=120,transpose=0,pause=0.,boost=1.1,repeat=0,fn="out.wav",s
 				else:
 					b=length(x[1])
 
-				render2(a, b, vol, int(ex_pos), kn, note)
+				yield int(ex_pos), render2(a, b, vol, kn, note)
 				ex_pos = ex_pos + b
 
 			if x[0]=='r':
 				b=length(x[1])
 				ex_pos = ex_pos + b
 
+	yield ex_pos, None
+
+def _render(song, bpm, transpose, pause, boost, repeat, silent, ks_engine):
+	"Render song to a float64 array (1.0 = full scale)."
+	data, out_len = blockstream.overlap_add(_notes(song, bpm, transpose, pause, boost, repeat, silent, ks_engine), 44100)
+	return blockstream.normalize(data, out_len)
+
+def render(song,bpm=120,transpose=0,pause=0.,boost=1.1,repeat=0,silent=False,ks_engine="block"):
+	"Render song in memory, return (float32 samples, sample rate)."
+	return _render(song, bpm, transpose, pause, boost, repeat, silent, ks_engine).astype(np.float32), 44100
+
+def iter_blocks(song,bpm=120,transpose=0,pause=0.,boost=1.1,repeat=0,silent=False,ks_engine="block",block_size=8192,gain=None):
+	"""Like render(), but yields int16 blocks as soon as no later note can
+	reach them (see blockstream.iter_blocks)."""
+	return blockstream.iter_blocks(_notes(song, bpm, transpose, pause, boost, repeat, silent, ks_engine), 44100, block_size, gain)
+
+def render_events(ev,transpose=0,pause=0.,silent=False,ks_engine="block"):
+	"""Pluck every note of an event array (see events.py) into one buffer,
+	return (float32 samples, sample rate)."""
+	notes = events.notes(ev, _synth(pause, ks_engine), 44100, transpose, silent)
+	data, out_len = blockstream.overlap_add(notes, 44100)
+	return blockstream.normalize(data, out_len).astype(np.float32), 44100
+
+def make_wav(song,bpm=120,transpose=0,pause=0.,boost=1.1,repeat=0,fn="out.wav",silent=False,ks_engine="block"):
+	data = _render(song, bpm, transpose, pause, boost, repeat, silent, ks_engine)
+
 	##########################################################################
 	# Write to output file (in WAV format)
 	##########################################################################
 	if silent == False:
 		print("Writing to file", fn)
-
-	data = data / (data.max() * 2.)
-	out_len = int(2. * 44100. + ex_pos+.5)
-	data2 = np.zeros(out_len, np.short)
-	data2[:] = 32000. * data[:out_len]
-	f.writeframes(data2.tostring())
-	f.close()
+	wavio.write_wav(fn, data, 44100, rnd = False)
 	print()
 
 ##########################################################################
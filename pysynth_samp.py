@@ -30,12 +30,14 @@
 
 from __future__ import division
 
-import wave, struct
 import numpy as np
-from math import sin, cos, pi, log, exp
+import wavio
+import blockstream
+import events
 from mixfiles import mix_files
 from demosongs import *
 from mkfreq import getfreq, getfn
+from samplebank import bank
 
 pitchhz, keynum = getfreq()
 
@@ -46,6 +48,10 @@ fnames = getfn(10)
 #       48 kHz version:
 patchpath = "/usr/share/sounds/SalamanderGrandPianoV3_48khz24bit/48khz24bit/"
 
+# Decoded samples are kept in memory between notes and renders;
+#   use e.g. bank.set_limit(256 * 2**20) to change the memory ceiling
+#   and bank.stats() to see how well the cache works (see samplebank.py)
+
 
 ##########################################################################
 #### Main program starts below
@@ -69,53 +75,25 @@ patchpath = "/usr/share/sounds/SalamanderGrandPianoV3_48khz24bit/48khz24bit/"
 
 ##########################################################################
 
-def make_wav(song,bpm=120,transpose=0,leg_stac=.9,boost=1.1,repeat=0,fn="out.wav", silent=False):
-	f=wave.open(fn,'w')
-
-	f.setnchannels(1)
-	f.setsampwidth(2)
-	f.setframerate(48000)
-	f.setcomptype('NONE','Not Compressed')
-
-	bpmfac = 120./bpm
-
-	def length(l):
-	    return 96000./l*bpmfac
-
-	def getval(v):
-		a = struct.unpack('i', v + b'\x00')[0] / 256 - 32768
-		if a > 0:
-			a =  1 - a / 32768
-		else:
-			a = -1 - a / 32768
-		return(a)
-
-	def render2(a, b, vol, pos, knum, note):
+def _synth(leg_stac):
+	"Return render2(a, b, vol, knum, note), which synthesizes one note of b samples."
+	def render2(a, b, vol, knum, note):
 		snd_len = int(b)
 
-		wf = wave.open(patchpath + fnames[knum][0], "rb")
-		wl = wf.getnframes()
-		wd = wf.readframes(wl)
-		new = np.zeros(wl // 6)
-
-		for x in range(wl // 6):
-			#left: getval( wd[6 * x:6 * x +3] )
-			#right: getval( wd[6 * x + 3:6 * x +6] )
-			new[x] = getval( wd[6 * x:6 * x +3] )
-
-		wf.close()
+		# (only the first sixth of each sample file is used)
+		new = bank.load(patchpath + fnames[knum][0], div = 6)
 
 		f = fnames[knum][1]
 		# Salamander samples every third piano key, so other notes
 		# are created by playing these samples faster (with linear interpolation):
 		if f > 1:
 			f2 = int(len(new) / f)
-			new2 = np.zeros(f2)
-			for x in range(f2):
-				q = x * f - int(x * f)
-				new2[x] = (1 - q) * new[int(x * f)] + q * new[int(x * f) + 1]
+			xf = np.arange(f2) * f
+			xi = xf.astype(int)
+			q = xf - xi
+			new2 = (1 - q) * new[xi] + q * new[xi + 1]
 		else:
-			new2 = new
+			new2 = new.astype(float)
 		raw_note = len(new2)
 
 		dec_ind = int(leg_stac*b)
@@ -124,21 +102,19 @@ def make_wav(song,bpm=120,transpose=0,leg_stac=.9,boost=1.1,repeat=0,fn="out.wav
 		if snd_len > raw_note:
 			print("Warning, note too long:", snd_len, raw_note)
 			snd_len = raw_note
-		data[pos:pos+snd_len] += ( new2[:snd_len] * vol  )
+		return ( new2[:snd_len] * vol  )
 
-	ex_pos = 0.
-	t_len = 0
-	for y, x in song:
-		if x < 0:
-			t_len+=length(-2.*x/3.)
-		else:
-			t_len+=length(x)
-		if y[-1] == '*':
-			y = y[:-1]
-		if not y[-1].isdigit():
-			y += '4'
-	data = np.zeros(int((repeat+1)*t_len + 480000))
+	return render2
 
+def _notes(song, bpm, transpose, leg_stac, boost, repeat, silent):
+	"Yield (position, waveform) for each note, then (end position, None)."
+	render2 = _synth(leg_stac)
+	bpmfac = 120./bpm
+
+	def length(l):
+	    return 96000./l*bpmfac
+
+	ex_pos = 0.
 	for rp in range(repeat+1):
 		for nn, x in enumerate(song):
 			if not nn % 4 and silent == False:
@@ -160,25 +136,44 @@ def make_wav(song,bpm=120,transpose=0,leg_stac=.9,boost=1.1,repeat=0,fn="out.wav
 				else:
 					b=length(x[1])
 
-				render2(a, b, vol, int(ex_pos), kn, note)
+				yield int(ex_pos), render2(a, b, vol, kn, note)
 				ex_pos = ex_pos + b
 
 			if x[0]=='r':
 				b=length(x[1])
 				ex_pos = ex_pos + b
 
+	yield ex_pos, None
+
+def _render(song, bpm, transpose, leg_stac, boost, repeat, silent):
+	"Render song to a float64 array (1.0 = full scale)."
+	data, out_len = blockstream.overlap_add(_notes(song, bpm, transpose, leg_stac, boost, repeat, silent), 48000)
+	return blockstream.normalize(data, out_len)
+
+def render(song,bpm=120,transpose=0,leg_stac=.9,boost=1.1,repeat=0, silent=False):
+	"Render song in memory, return (float32 samples, sample rate)."
+	return _render(song, bpm, transpose, leg_stac, boost, repeat, silent).astype(np.float32), 48000
+
+def iter_blocks(song,bpm=120,transpose=0,leg_stac=.9,boost=1.1,repeat=0,silent=False,block_size=8192,gain=None):
+	"""Stream the song as int16 blocks at 48 kHz (see blockstream.iter_blocks)."""
+	return blockstream.iter_blocks(_notes(song, bpm, transpose, leg_stac, boost, repeat, silent), 48000, block_size, gain)
+
+def render_events(ev,transpose=0,leg_stac=.9,silent=False):
+	"""Play an event array (see events.py) with the piano samples,
+	return (float32 samples, 48000)."""
+	notes = events.notes(ev, _synth(leg_stac), 48000, transpose, silent)
+	data, out_len = blockstream.overlap_add(notes, 48000)
+	return blockstream.normalize(data, out_len).astype(np.float32), 48000
+
+def make_wav(song,bpm=120,transpose=0,leg_stac=.9,boost=1.1,repeat=0,fn="out.wav", silent=False):
+	data = _render(song, bpm, transpose, leg_stac, boost, repeat, silent)
+
 	##########################################################################
 	# Write to output file (in WAV format)
 	##########################################################################
 	if silent == False:
 		print("Writing to file", fn)
-
-	data = data / (data.max() * 2.)
-	out_len = int(2. * 48000. + ex_pos+.5)
-	data2 = np.zeros(out_len, np.short)
-	data2[:] = 32000. * data[:out_len]
-	f.writeframes(data2.tostring())
-	f.close()
+	wavio.write_wav(fn, data, 48000, rnd = False)
 	print()
 
 ##########################################################################
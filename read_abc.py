@@ -6,47 +6,37 @@ Parse a file in ABC music notation format and render with PySynth.
 Usage:
 
 read_abc.py filename [num_song] [--syn_b/--syn_c/--syn_d/--syn_e/--syn_f/--syn_p/--syn_s/--syn_samp]
+read_abc.py filename --all [--jobs=N] [--outdir=DIR] [--syn_...]
 
 * num_song selects the song in the file corresponding to the number given
 * --syn_b and --syn_s can be added to use the PySynth B or PySynth S
     modules, respectively, instead of the default PySynth A
+* --all renders every tune in the file with N worker processes (default:
+    one per CPU) to DIR/<name>_<num>.wav and writes DIR/summary.json
+    with the timings of each tune and the tunes that failed
+
+The parser can also be used as a library:
+
+    tune = read_abc.read_tune("songbook.abc", 42)
+    pysynth.make_wav(tune.song, bpm = tune.bpm)
+
+read_tune() looks the tune up in an index of the byte offsets of all
+X: headers, which is cached in songbook.abc.idx and rebuilt when the
+file changes.
 
 Some of the definitions are borrowed from PlayABC 1.1
 
 2012-07-17
 """
 
-import sys
+import sys, os, json, time
+import multiprocessing
+import synths
 if sys.version >= '3':
 	import urllib.request, urllib.error, urllib.parse
 else:
 	import urllib2
 
-sel = False
-try: num = int(sys.argv[2])
-except: num = 1
-song = []
-
-if "--syn_b" in sys.argv:
-	import pysynth_b as pysynth
-elif "--syn_s" in sys.argv:
-	import pysynth_s as pysynth
-elif "--syn_e" in sys.argv:
-	import pysynth_e as pysynth
-elif "--syn_c" in sys.argv:
-	import pysynth_c as pysynth
-elif "--syn_d" in sys.argv:
-	import pysynth_d as pysynth
-elif "--syn_f" in sys.argv:
-	import pysynth_f as pysynth
-elif "--syn_p" in sys.argv:
-	import pysynth_p as pysynth
-elif "--syn_samp" in sys.argv:
-	import pysynth_samp as pysynth
-else:
-	import pysynth
-
-
 # flatten or sharpen notes according to key signature
 # key_sig is in range [-7 .. + 7] meaning that many
 # flats (-ve) or sharps (+ve)
@@ -123,137 +113,6 @@ def simp_line(a):
 					break			
 	return ''.join(a2)
 
-chord = False
-tie_next = 0
-second_ver, do_repeat, only_first, triplet = [], False, False, 0
-
-def add_note(a, n):
-	global song, chord, measure_sharps_flats, tie_next, second_ver, do_repeat, only_first, triplet, tripfac
-
-	start, note, leng, next_half, firstnote = (
-		False, None, float(unit), False, '')
-	for x in range(n, len(a)):
-		if note and a[x] in (' ', '>', '(', '|', ':'):
-			break
-		if a[x] == '>':
-			l = 1. / song[-1][1]
-			l = 1.5 * l
-			song[-1][1] = 1. / l
-			next_half = True
-			continue
-		if not note and a[x] == '%':
-			return
-		if not note and a[x] == '(' and a[x+1].isdigit():
-			triplet = int(a[x+1])
-			tripfac = triptab[triplet]
-			try:
-				if a[x+2] == ':':
-					tripfac = float(triplet) / float(a[x+3])
-					if a[x+4] == ':':
-						triplet = int(a[x+5])
-			except: pass
-		if not note and a[x] == '[':
-			chord = True
-			continue
-		if not note and a[x] == '|':
-			firstnote = '*'
-			measure_sharps_flats = global_sharps_flats.copy()
-			if a[x+1] == ':':
-				second_ver, do_repeat = [], True
-			if a[x+1] == '1':
-				only_first = True
-			if a[x+1] == '2':
-				only_first = False
-			continue
-		if not note and a[x] == ':':
-			if a[x+1] == ':' or a[x+1] == '|':
-				song = song + second_ver
-				second_ver, do_repeat = [], False
-		if note and a[x] == '-':
-			tie_next = 2
-			continue
-		if a[x] == ',':
-			oct -= 1
-			note_oct = "%s%u" % (note, oct)
-			continue
-		if a[x] == "'":
-			oct += 1
-			note_oct = "%s%u" % (note, oct)
-			continue
-		if not note and a[x].isalpha():
-			note = a[x].lower()
-			if a[x].isupper(): oct = 4
-			else: oct = 5
-			note_oct = "%s%u" % (note, oct)
-			if a[x-1] == '_':
-				for oct2 in range(9):
-					note_oct2 = "%s%u" % (note, oct2)
-					orig = measure_sharps_flats.get(note_oct2, 0)
-					measure_sharps_flats[note_oct2] = orig - 1
-			if a[x-1] == '^':
-				for oct2 in range(9):
-					note_oct2 = "%s%u" % (note, oct2)
-					orig = measure_sharps_flats.get(note_oct2, 0)
-					measure_sharps_flats[note_oct2] = orig + 1
-			if a[x-1] == '=':
-				for oct2 in range(9):
-					note_oct2 = "%s%u" % (note, oct2)
-					measure_sharps_flats[note_oct2] = 0
-			continue
-		if note and a[x].isdigit():
-			leng = float(unit) / float(a[x])
-			continue
-		if note and a[x] == '/':
-			try: fac = float(a[x-1]) / float(a[x+1])
-			except: fac = .5
-			leng = float(unit) / fac
-		if note and a[x].isalpha() or a[x] == '[':
-			break
-
-	if note:
-		if triplet:
-			leng *= tripfac
-			triplet -= 1
-		if note[0].lower() == 'z' or note[0].lower() == 'x':
-			note = 'r'
-			song += [["%s" % note, leng]]
-			if not only_first:
-				second_ver += [["%s" % note, leng]]
-		else:
-			corr_note = piano[piano.index(note_oct) + measure_sharps_flats.get(note_oct, 0)]
-			corr_note = "%s%s" % (corr_note, firstnote)
-			if tie_next == 1:
-				if corr_note == song[-1][0]:
-					song[-1][1] = 1. / (1./song[-1][1] + 1. / leng)
-					try:
-						second_ver[-1][1] = song[-1][1]
-					except: pass
-				tie_next = 0
-			else:
-				song += [[corr_note, leng]]
-				if not only_first:
-					second_ver += [[corr_note, leng]]
-				if next_half:
-					leng = 1. / song[-1][1]
-					song[-1][1] = 1. / (.5 * leng)
-					next_half = False
-				if tie_next == 2: tie_next = 1
-		return x
-	else: return 0
-
-def parse_line(a):
-	global chord
-	n = 0
-	while n < len(a):
-		n = add_note(a, n)
-		if chord:
-			for n2 in range(n, len(a)):
-				if a[n2] == ']':
-					n = n2
-					chord = False
-					break
-		if not n: break
-
 def mk_triptab(m):
 	if int(m.split('/')[0]) % 2:
 		n = 3
@@ -270,38 +129,177 @@ def get_bpm(s, u = "1/4"):
 		c, d = a.split('/')
 		return int(b) * 4. * float(c) / float(d)
 
-fn = sys.argv[1]
-if fn[:5] == 'http:' or fn[:6] == 'https:':
-	if sys.version >= '3':
-		f = urllib.request.urlopen(fn).read().decode('utf-8').splitlines(keepends=True)
-	else:
-		f = urllib2.urlopen(fn)
-else:
-	f = open(fn)
-
-bpm     = 120
-meter   = "4/4"
-triptab = None
-nunit   = "1/4"
-unit    = 4
-
-for l in f:
-	if not l or l[0] in ('w', 'W', '%'): continue
-	if 'X:' in l:
-		sn = int(l.split(':')[1])
-		if sn == num:
-			sel = True
-	if 'L:' in l and sel:
-		nunit = l.split(':')[1].strip()
-		unit = int(l.split('/')[1])
-	if 'M:' in l and sel:
-		meter = l.split(':')[1].strip()
-		if meter == 'C': meter = "4/4"
-	if 'Q:' in l and sel:
-		bpm = get_bpm(l.split(':')[1].strip(), nunit)
-	if 'K:' in l and sel:
-		key = l.split(':')[1].strip().replace('maj', '').replace('min', 'm')
-		global_sharps_flats = {}
+
+class Tune(object):
+	"A parsed tune: song is in PySynth format, to be played at bpm"
+
+	def __init__(self, num, title, key, unit, meter, bpm, song):
+		self.num = num
+		self.title = title
+		self.key = key
+		self.unit = unit
+		self.meter = meter
+		self.bpm = bpm
+		self.song = song
+
+	def __repr__(self):
+		return "<Tune %u %r, %u notes>" % (self.num, self.title, len(self.song))
+
+class ABCParser(object):
+	"""Parses one tune from the lines of an ABC file
+
+	All parser state lives in the instance, so several tunes can be
+	parsed at the same time (one parser per tune)."""
+
+	def __init__(self):
+		self.song = []
+		self.chord = False
+		self.tie_next = 0
+		self.second_ver, self.do_repeat, self.only_first, self.triplet = [], False, False, 0
+		self.tripfac = 1.
+		self.bpm     = 120
+		self.meter   = "4/4"
+		self.triptab = None
+		self.nunit   = "1/4"
+		self.unit    = 4
+		self.key     = "C"
+		self.title   = ""
+		self.piano   = piano_s
+		self.global_sharps_flats = {}
+		self.measure_sharps_flats = {}
+
+	def add_note(self, a, n):
+		song = self.song
+		unit = self.unit
+		start, note, leng, next_half, firstnote = (
+			False, None, float(unit), False, '')
+		for x in range(n, len(a)):
+			if note and a[x] in (' ', '>', '(', '|', ':'):
+				break
+			if a[x] == '>':
+				l = 1. / song[-1][1]
+				l = 1.5 * l
+				song[-1][1] = 1. / l
+				next_half = True
+				continue
+			if not note and a[x] == '%':
+				return
+			if not note and a[x] == '(' and a[x+1].isdigit():
+				self.triplet = int(a[x+1])
+				self.tripfac = self.triptab[self.triplet]
+				try:
+					if a[x+2] == ':':
+						self.tripfac = float(self.triplet) / float(a[x+3])
+						if a[x+4] == ':':
+							self.triplet = int(a[x+5])
+				except: pass
+			if not note and a[x] == '[':
+				self.chord = True
+				continue
+			if not note and a[x] == '|':
+				firstnote = '*'
+				self.measure_sharps_flats = self.global_sharps_flats.copy()
+				if a[x+1] == ':':
+					self.second_ver, self.do_repeat = [], True
+				if a[x+1] == '1':
+					self.only_first = True
+				if a[x+1] == '2':
+					self.only_first = False
+				continue
+			if not note and a[x] == ':':
+				if a[x+1] == ':' or a[x+1] == '|':
+					song = self.song = song + self.second_ver
+					self.second_ver, self.do_repeat = [], False
+			if note and a[x] == '-':
+				self.tie_next = 2
+				continue
+			if a[x] == ',':
+				oct -= 1
+				note_oct = "%s%u" % (note, oct)
+				continue
+			if a[x] == "'":
+				oct += 1
+				note_oct = "%s%u" % (note, oct)
+				continue
+			if not note and a[x].isalpha():
+				note = a[x].lower()
+				if a[x].isupper(): oct = 4
+				else: oct = 5
+				note_oct = "%s%u" % (note, oct)
+				msf = self.measure_sharps_flats
+				if a[x-1] == '_':
+					for oct2 in range(9):
+						note_oct2 = "%s%u" % (note, oct2)
+						orig = msf.get(note_oct2, 0)
+						msf[note_oct2] = orig - 1
+				if a[x-1] == '^':
+					for oct2 in range(9):
+						note_oct2 = "%s%u" % (note, oct2)
+						orig = msf.get(note_oct2, 0)
+						msf[note_oct2] = orig + 1
+				if a[x-1] == '=':
+					for oct2 in range(9):
+						note_oct2 = "%s%u" % (note, oct2)
+						msf[note_oct2] = 0
+				continue
+			if note and a[x].isdigit():
+				leng = float(unit) / float(a[x])
+				continue
+			if note and a[x] == '/':
+				try: fac = float(a[x-1]) / float(a[x+1])
+				except: fac = .5
+				leng = float(unit) / fac
+			if note and a[x].isalpha() or a[x] == '[':
+				break
+
+		if note:
+			if self.triplet:
+				leng *= self.tripfac
+				self.triplet -= 1
+			if note[0].lower() == 'z' or note[0].lower() == 'x':
+				note = 'r'
+				song += [["%s" % note, leng]]
+				if not self.only_first:
+					self.second_ver += [["%s" % note, leng]]
+			else:
+				piano = self.piano
+				corr_note = piano[piano.index(note_oct) + self.measure_sharps_flats.get(note_oct, 0)]
+				corr_note = "%s%s" % (corr_note, firstnote)
+				if self.tie_next == 1:
+					if corr_note == song[-1][0]:
+						song[-1][1] = 1. / (1./song[-1][1] + 1. / leng)
+						try:
+							self.second_ver[-1][1] = song[-1][1]
+						except: pass
+					self.tie_next = 0
+				else:
+					song += [[corr_note, leng]]
+					if not self.only_first:
+						self.second_ver += [[corr_note, leng]]
+					if next_half:
+						leng = 1. / song[-1][1]
+						song[-1][1] = 1. / (.5 * leng)
+						next_half = False
+					if self.tie_next == 2: self.tie_next = 1
+			return x
+		else: return 0
+
+	def parse_line(self, a):
+		n = 0
+		while n < len(a):
+			n = self.add_note(a, n)
+			if self.chord:
+				for n2 in range(n, len(a)):
+					if a[n2] == ']':
+						n = n2
+						self.chord = False
+						break
+			if not n: break
+
+	def set_key(self, key):
+		"Set up the sharps and flats for a K: field."
+		self.key = key
+		self.global_sharps_flats = {}
 		fsnum = 0
 		for x, y, z in key_sigs:
 			if x.lower() == key.lower() or y.lower() == key.lower():
@@ -309,35 +307,229 @@ for l in f:
 		if fsnum < 0:
 			fsrange = list(range(fsnum, 0))
 			sign = -1
-			piano = piano_f
+			self.piano = piano_f
 		else:
 			fsrange = list(range(1, fsnum + 1))
 			sign = 1
-			piano = piano_s
+			self.piano = piano_s
 		for fs in fsrange:
 			for oct in range(9):
-				global_sharps_flats['%s%u' % (flats_and_sharps[fs], oct)] = sign
-		#print global_sharps_flats
-		measure_sharps_flats = global_sharps_flats.copy()
-	if l.strip() == '' and sel:
-		break
-	if sel and not (l[0].isalpha() and l[1] == ':'):
-		if not triptab: triptab = mk_triptab(meter)
-		l2 = simp_line(list(l))
-		parse_line(l2)
-
-if do_repeat:
-	song = song + second_ver
-
-if not sel:
-	print()
-	print("*** Song %u not found in file %s!" % (num, fn))
-	print()
-else:
-	print(key, unit)
-	print(song)
-	print()
-	print(len(song))
+				self.global_sharps_flats['%s%u' % (flats_and_sharps[fs], oct)] = sign
+		self.measure_sharps_flats = self.global_sharps_flats.copy()
+
+	def parse(self, lines, num):
+		"""Parse tune number num from an iterable of lines.
+
+		Returns a Tune, or None if there is no tune with that number."""
+		sel = False
+		for l in lines:
+			if not l or l[0] in ('w', 'W', '%'): continue
+			if 'X:' in l:
+				sn = int(l.split(':')[1])
+				if sn == num:
+					sel = True
+			if l.startswith('T:') and sel and not self.title:
+				self.title = l.split(':', 1)[1].strip()
+			if 'L:' in l and sel:
+				self.nunit = l.split(':')[1].strip()
+				self.unit = int(l.split('/')[1])
+			if 'M:' in l and sel:
+				self.meter = l.split(':')[1].strip()
+				if self.meter == 'C': self.meter = "4/4"
+			if 'Q:' in l and sel:
+				self.bpm = get_bpm(l.split(':')[1].strip(), self.nunit)
+			if 'K:' in l and sel:
+				self.set_key(l.split(':')[1].strip().replace('maj', '').replace('min', 'm'))
+			if l.strip() == '' and sel:
+				break
+			if sel and not (l[0].isalpha() and l[1] == ':'):
+				if not self.triptab: self.triptab = mk_triptab(self.meter)
+				l2 = simp_line(list(l))
+				self.parse_line(l2)
+
+		if not sel:
+			return None
+		if self.do_repeat:
+			self.song = self.song + self.second_ver
+		return Tune(num, self.title, self.key, self.unit, self.meter, self.bpm, self.song)
+
+def parse_tune(lines, num):
+	"Parse tune number num from the lines of an ABC file (see ABCParser.parse)."
+	return ABCParser().parse(lines, num)
+
+def tune_number(line):
+	"Return the number of an X: header line, or None."
+	if not line or line[:1] in (b'w', b'W', b'%') or b'X:' not in line:
+		return None
+	try:
+		return int(line.split(b':')[1])
+	except ValueError:
+		return None
+
+def build_index(fn):
+	"Return a dict of tune number -> byte offset of its X: line in the file fn."
+	index = {}
+	pos = 0
+	with open(fn, 'rb') as f:
+		for l in f:
+			sn = tune_number(l)
+			if sn is not None and sn not in index:
+				index[sn] = pos
+			pos += len(l)
+	return index
+
+def load_index(fn):
+	"""Return the tune index of fn, using the cache in fn + '.idx' if it is current.
+
+	The cache is rebuilt when the modification time or size of fn changes;
+	if it cannot be written, the index is just not cached."""
+	st = os.stat(fn)
+	try:
+		with open(fn + '.idx') as f:
+			c = json.load(f)
+		if c['mtime'] == st.st_mtime and c['size'] == st.st_size:
+			return dict((int(k), v) for k, v in c['tunes'].items())
+	except (IOError, OSError, ValueError, KeyError):
+		pass
+	index = build_index(fn)
+	try:
+		with open(fn + '.idx', 'w') as f:
+			json.dump({'mtime': st.st_mtime, 'size': st.st_size, 'tunes': index}, f)
+	except (IOError, OSError):
+		pass
+	return index
+
+def read_lines(f):
+	"Yield the decoded lines of a binary file from its current position."
+	for l in f:
+		yield l.decode('utf-8', 'replace').replace('\r\n', '\n')
+
+def read_tune(fn, num, index = None):
+	"Read tune number num from the file fn with a single seek, return a Tune or None."
+	if index is None:
+		index = load_index(fn)
+	if num not in index:
+		return None
+	with open(fn, 'rb') as f:
+		f.seek(index[num])
+		return parse_tune(read_lines(f), num)
+
+def split_tunes(lines):
+	"Split the lines of an ABC file into (tune number, lines) for each X: header."
+	num, tune = None, []
+	for l in lines:
+		sn = tune_number(l.encode('utf-8'))
+		if sn is not None:
+			if num is not None:
+				yield num, tune
+			num, tune = sn, []
+		if num is not None:
+			tune.append(l)
+	if num is not None:
+		yield num, tune
+
+def _render_tune(job):
+	"Render one tune in a worker process, return (num, seconds, error)."
+	num, song, bpm, synth, fn = job
+	t = time.time()
+	try:
+		synths.get_synth(synth).make_wav(song, bpm = bpm, fn = fn, silent = True)
+	except Exception as e:
+		return num, time.time() - t, "%s: %s" % (type(e).__name__, e)
+	return num, time.time() - t, None
+
+def render_songbook(lines, outdir, name = "tune", synth = "a", jobs = None):
+	"""Render every tune in the lines of an ABC file with a process pool.
+
+	The file is parsed once in this process, tunes that fail to parse are
+	skipped. Each tune is written to outdir/<name>_<num>.wav. Returns a
+	summary (also written to outdir/summary.json) with the parse and
+	render time of each tune and the failures."""
+	t0 = time.time()
+	if not os.path.isdir(outdir):
+		os.makedirs(outdir)
+	tunes, failures, todo = {}, [], []
+	failed = set()		# numbers of the tunes that failed to parse
+	for num, tl in split_tunes(lines):
+		if num in tunes or num in failed:
+			continue	# (like read_tune, the first tune with a number wins)
+		t = time.time()
+		try:
+			tune = parse_tune(tl, num)
+			if not tune.song:
+				raise ValueError("no notes")
+		except Exception as e:
+			failures.append({'num': num, 'stage': 'parse', 'error': "%s: %s" % (type(e).__name__, e)})
+			failed.add(num)
+			continue
+		fn = os.path.join(outdir, "%s_%u.wav" % (name, num))
+		tunes[num] = {'num': num, 'title': tune.title, 'file': fn, 'notes': len(tune.song),
+			'parse_time': time.time() - t}
+		todo.append((num, tune.song, tune.bpm, synth, fn))
+
+	pool = multiprocessing.Pool(jobs)
+	try:
+		for num, secs, err in pool.imap_unordered(_render_tune, todo):
+			if err:
+				print("Tune %u failed: %s" % (num, err))
+				failures.append({'num': num, 'stage': 'render', 'error': err})
+				del tunes[num]
+			else:
+				print("Tune %u done (%.2f s)" % (num, secs))
+				tunes[num]['render_time'] = secs
+	finally:
+		pool.close()
+		pool.join()
+
+	summary = {'synth': synth, 'total_time': time.time() - t0,
+		'tunes': [tunes[n] for n in sorted(tunes)],
+		'failures': sorted(failures, key = lambda f: f['num'])}
+	with open(os.path.join(outdir, 'summary.json'), 'w') as f:
+		json.dump(summary, f, indent = 1)
+	return summary
+
+if __name__ == '__main__':
+	synth = synths.synth_name(sys.argv)
+	pysynth = synths.get_synth(synth)
+
+	try: num = int(sys.argv[2])
+	except: num = 1
+
+	fn = sys.argv[1]
+	if "--all" in sys.argv:
+		if fn[:5] == 'http:' or fn[:6] == 'https:':
+			f = urllib.request.urlopen(fn).read().decode('utf-8').splitlines(keepends=True)
+		else:
+			with open(fn, 'rb') as abc:
+				f = list(read_lines(abc))
+		outdir, jobs = ".", None
+		for a in sys.argv[2:]:
+			if a.startswith("--outdir="):
+				outdir = a[9:]
+			elif a.startswith("--jobs="):
+				jobs = int(a[7:])
+		name = os.path.splitext(os.path.basename(fn))[0] or "tune"
+		s = render_songbook(f, outdir, name, synth, jobs)
+		print("%u tunes rendered, %u failed, %.2f s" % (len(s['tunes']), len(s['failures']), s['total_time']))
+		sys.exit(0)
+
+	if fn[:5] == 'http:' or fn[:6] == 'https:':
+		if sys.version >= '3':
+			f = urllib.request.urlopen(fn).read().decode('utf-8').splitlines(keepends=True)
+		else:
+			f = urllib2.urlopen(fn)
+		tune = parse_tune(f, num)
+	else:
+		tune = read_tune(fn, num)
 
-	pysynth.make_wav(song, bpm = bpm)
+	if tune is None:
+		print()
+		print("*** Song %u not found in file %s!" % (num, fn))
+		print()
+	else:
+		print(tune.key, tune.unit)
+		print(tune.song)
+		print()
+		print(len(tune.song))
 
+		pysynth.make_wav(tune.song, bpm = tune.bpm)
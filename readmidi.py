@@ -6,6 +6,17 @@
 
 # python readmidi.py file.mid [tracknum] [file.wav]  [--syn_b/--syn_c/--syn_d/--syn_e/--syn_p/--syn_s/--syn_samp]
 
+# Render several tracks in parallel and mix them:
+
+# python readmidi.py file.mid [file.wav] --all [--jobs=N] [--syn_...]
+# python readmidi.py file.mid [file.wav] --tracks=1,2:b,5:samp [--jobs=N] [--syn_...]
+
+# (a synth given after a track number overrides the --syn_ flag for that track)
+
+# --quantize=0.25 rounds note starts and ends to a grid of sixteenth notes
+# --events renders tracks for B, E, S and samp polyphonically and with all
+#   tempo changes (otherwise the last tempo in the file is used)
+
 # Based on code from https://github.com/osakared/midifile.py
 # which appears to be based on
 # https://github.com/gasman/jasmid/blob/master/midifile.js
@@ -38,7 +49,11 @@ OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 """
 
-import struct
+import struct, os
+import multiprocessing
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+import events, synths, wavio
 
 class Note(object):
 	"Represents a single MIDI note"
@@ -62,113 +77,239 @@ class Note(object):
 	def get_end(self):
 		return self.start + self.duration
 
+# Notes of a track, start and duration in quarter notes; tick and end_tick
+#   are the raw MIDI times (end_tick is also set for notes ended by a
+#   note on with velocity 0, which keep duration 0)
+NOTE_DTYPE = np.dtype([('start', '<f8'), ('duration', '<f8'), ('pitch', 'u1'), ('velocity', 'u1'), ('channel', 'u1'),
+	('tick', '<i8'), ('end_tick', '<i8')])
+
+class TempoMap(object):
+	"""Converts MIDI ticks to seconds and samples for a file with tempo changes
+
+	changes is a list of (tick, microseconds per quarter note) Set Tempo
+	events; 120 bpm applies before the first one. For each segment of
+	constant tempo the map keeps its first tick and its offset in seconds
+	and samples, so a time is found by binary search over the segments.
+	All conversions take scalars or arrays of ticks."""
+
+	def __init__(self, changes, time_division, rate = 44100):
+		self.rate = rate
+		seg = {0: 500000}
+		for tick, usec in sorted(changes, key = lambda c: c[0]):
+			seg[tick] = usec	# the last change at a tick wins
+		self.ticks = np.array(sorted(seg), dtype = np.int64)
+		self.usec = np.array([seg[t] for t in self.ticks], dtype = float)
+		# seconds per tick in each segment
+		self.spt = self.usec / 1e6 / time_division
+		self.seconds = np.concatenate(([0.], np.cumsum(np.diff(self.ticks) * self.spt[:-1])))
+		self.samples = self.seconds * rate
+
+	def segment(self, ticks):
+		"Index of the tempo segment for each tick."
+		return np.searchsorted(self.ticks, ticks, side = 'right') - 1
+
+	def tick_to_seconds(self, ticks):
+		"Convert ticks to seconds."
+		ticks = np.asarray(ticks)
+		i = self.segment(ticks)
+		return self.seconds[i] + (ticks - self.ticks[i]) * self.spt[i]
+
+	def tick_to_sample(self, ticks):
+		"Convert ticks to sample positions (rounded to the nearest sample)."
+		ticks = np.asarray(ticks)
+		i = self.segment(ticks)
+		return np.round(self.samples[i] + (ticks - self.ticks[i]) * self.spt[i] * self.rate).astype(np.int64)
+
+	def bpm(self, ticks):
+		"Tempo in quarter notes per minute at the given ticks."
+		return 6e7 / self.usec[self.segment(ticks)]
+
+class NoteList(object):
+	"Sequence of Note objects for a track array, created only when accessed"
+
+	def __init__(self, notes):
+		self.notes = notes
+
+	def __len__(self):
+		return len(self.notes)
+
+	def __getitem__(self, i):
+		if isinstance(i, slice):
+			return NoteList(self.notes[i])
+		n = self.notes[i]
+		return Note(int(n['channel']), int(n['pitch']), int(n['velocity']), float(n['start']), float(n['duration']))
+
+	def __iter__(self):
+		for i in range(len(self.notes)):
+			yield self[i]
+
 class MidiFile(object):
-	"Represents the notes in a MIDI file"
-	
-	def read_byte(self, file):
-		return struct.unpack('B', file.read(1))[0]
-	
-	def read_variable_length(self, file, counter):
-		counter -= 1
-		num = self.read_byte(file)
-		
-		if num & 0x80:
-			num = num & 0x7F
-			while True:
-				counter -= 1
-				c = self.read_byte(file)
-				num = (num << 7) + (c & 0x7F)
-				if not (c & 0x80):
-					break
-		
-		return (num, counter)
+	"""Represents the notes in a MIDI file
+
+	notes holds one NOTE_DTYPE array per track; tracks gives the same
+	notes as Note objects. Note-on events with velocity 0 are kept as
+	notes of zero duration. tempo is the last tempo seen (in bpm);
+	tempo_map has all tempo changes (see TempoMap)."""
 	
+	def read_variable_length(self, data, pos):
+		"Return (number, new position) for the variable-length number at pos."
+		num = 0
+		while True:
+			c = data[pos]
+			pos += 1
+			num = (num << 7) + (c & 0x7F)
+			if not (c & 0x80):
+				return num, pos
+
 	def __init__(self, file_name):
 		self.tempo = 120
+		self.tempo_changes = []
+		self.notes = []
+		self.tracks = []
+		self.time_division = 480
 		try:
-			file = open(file_name, 'rb')
-			if file.read(4) != b'MThd': raise Exception('Not a MIDI file')
+			with open(file_name, 'rb') as file:
+				data = memoryview(file.read())
+			if data[:4] != b'MThd': raise Exception('Not a MIDI file')
 			self.file_name = file_name
-			size = struct.unpack('>i', file.read(4))[0]
+			size = struct.unpack_from('>i', data, 4)[0]
 			if size != 6: raise Exception('Unusual MIDI file with non-6 sized header')
-			self.format = struct.unpack('>h', file.read(2))[0]
-			self.track_count = struct.unpack('>h', file.read(2))[0]
-			self.time_division = struct.unpack('>h', file.read(2))[0]
+			self.format, self.track_count, self.time_division = struct.unpack_from('>hhh', data, 8)
 
 			# Now to fill out the arrays with the notes
-			self.tracks = []
-			for i in range(0, self.track_count):
-				self.tracks.append([])
-
-			for nn, track in enumerate(self.tracks):
-				abs_time = 0.
-
-				if file.read(4) != b'MTrk': raise Exception('Not a valid track')
-				size = struct.unpack('>i', file.read(4))[0]
-
-				# To keep track of running status
-				last_flag = None
-				while size > 0:
-					delta, size = self.read_variable_length(file, size)
-					delta /= float(self.time_division)
-					abs_time += delta
-
-					size -= 1
-					flag = self.read_byte(file)
-					# Sysex messages
-					if flag == 0xF0 or flag == 0xF7:
-						# print "Sysex"
-						while True:
-							size -= 1
-							if self.read_byte(file) == 0xF7: break
-					# Meta messages
-					elif flag == 0xFF:
-						size -= 1
-						type = self.read_byte(file)
-						if type == 0x2F:	# end of track event
-							self.read_byte(file)
-							size -= 1
-							break
-						print("Meta: " + str(type))
-						length, size = self.read_variable_length(file, size)
-						message = file.read(length)
-						# if type not in [0x0, 0x7, 0x20, 0x2F, 0x51, 0x54, 0x58, 0x59, 0x7F]:
-						print(length, message)
-						if type == 0x51:	# qpm/bpm
-							# http://www.recordingblogs.com/sa/Wiki?topic=MIDI+Set+Tempo+meta+message
-							self.tempo = 6e7 / struct.unpack('>i', b'\x00' + message)[0]
-							print("tempo =", self.tempo, "bpm")
-					# MIDI messages
-					else:
-						if flag & 0x80:
-							type_and_channel = flag
-							size -= 1
-							param1 = self.read_byte(file)
-							last_flag = flag
-						else:
-							type_and_channel = last_flag
-							param1 = flag
-						type = ((type_and_channel & 0xF0) >> 4)
-						channel = type_and_channel & 0xF
-						if type == 0xC:	# detect MIDI program change
-							print("program change, channel", channel, "=", param1)
-							continue
-						size -= 1
-						param2 = self.read_byte(file)
-						
-						# detect MIDI ons and MIDI offs
-						if type == 0x9:
-							track.append(Note(channel, param1, param2, abs_time))
-						elif type == 0x8:
-							for note in reversed(track):
-								if note.channel == channel and note.pitch == param1:
-									note.duration = abs_time - note.start
-									break
+			self.notes = [np.zeros(0, NOTE_DTYPE) for i in range(self.track_count)]
+			self.tracks = [NoteList(n) for n in self.notes]
+
+			pos = 14
+			for nn in range(self.track_count):
+				if data[pos:pos+4] != b'MTrk': raise Exception('Not a valid track')
+				size = struct.unpack_from('>i', data, pos + 4)[0]
+				pos += 8
+				self.notes[nn] = self.read_track(data, pos, pos + size)
+				self.tracks[nn] = NoteList(self.notes[nn])
+				pos += size
 
 		except Exception as e:
 			print("Cannot parse MIDI file: " + str(e))
-		finally:
-			file.close()
+		self.tempo_map = TempoMap(self.tempo_changes, self.time_division)
+
+	def events(self, track, tempo_map = None):
+		"""Return the notes of a track as an event array (see events.py).
+
+		Times follow all tempo changes; vel is the MIDI velocity / 127."""
+		tm = tempo_map or self.tempo_map
+		n = self.notes[track]
+		n = n[(n['velocity'] > 0) & (n['end_tick'] > n['tick'])]
+		start = tm.tick_to_seconds(n['tick'])
+		ev = np.zeros(len(n), events.EVENT_DTYPE)
+		ev['start'] = start
+		ev['dur'] = tm.tick_to_seconds(n['end_tick']) - start
+		ev['pitch'] = n['pitch']
+		ev['vel'] = n['velocity'] / 127.
+		return events.make_events(ev)
+
+	def read_track(self, data, pos, end):
+		"Parse the track chunk data[pos:end], return its notes as an array."
+		abs_time = 0.
+		abs_ticks = 0
+		starts, durs, pitches, vels, chans, ticks, ends = [], [], [], [], [], [], []
+		# indices of the sounding notes for each (channel, pitch)
+		active = {}
+
+		# To keep track of running status
+		last_flag = None
+		while pos < end:
+			if data[pos] < 0x80:	# (most deltas fit in one byte)
+				delta = data[pos]
+				pos += 1
+			else:
+				delta, pos = self.read_variable_length(data, pos)
+			abs_ticks += delta
+			delta /= float(self.time_division)
+			abs_time += delta
+
+			flag = data[pos]
+			pos += 1
+			# Sysex messages
+			if flag == 0xF0 or flag == 0xF7:
+				# print "Sysex"
+				length, pos = self.read_variable_length(data, pos)
+				pos += length
+			# Meta messages
+			elif flag == 0xFF:
+				type = data[pos]
+				pos += 1
+				if type == 0x2F:	# end of track event
+					break
+				print("Meta: " + str(type))
+				length, pos = self.read_variable_length(data, pos)
+				message = data[pos:pos+length].tobytes()
+				pos += length
+				# if type not in [0x0, 0x7, 0x20, 0x2F, 0x51, 0x54, 0x58, 0x59, 0x7F]:
+				print(length, message)
+				if type == 0x51:	# qpm/bpm
+					# http://www.recordingblogs.com/sa/Wiki?topic=MIDI+Set+Tempo+meta+message
+					usec = struct.unpack('>i', b'\x00' + message)[0]
+					self.tempo_changes.append((abs_ticks, usec))
+					self.tempo = 6e7 / usec
+					print("tempo =", self.tempo, "bpm")
+			# MIDI messages
+			else:
+				if flag & 0x80:
+					type_and_channel = flag
+					param1 = data[pos]
+					pos += 1
+					last_flag = flag
+				else:
+					type_and_channel = last_flag
+					param1 = flag
+				type = ((type_and_channel & 0xF0) >> 4)
+				channel = type_and_channel & 0xF
+				if type == 0xC:	# detect MIDI program change
+					print("program change, channel", channel, "=", param1)
+					continue
+				if type == 0xD:	# channel pressure has no second data byte
+					continue
+				param2 = data[pos]
+				pos += 1
+
+				# detect MIDI ons and MIDI offs
+				if type == 0x9:
+					stack = active.setdefault((channel, param1), [])
+					if param2 > 0:
+						stack.append(len(starts))
+					elif stack:
+						# note on with velocity 0 ends the note; the
+						#   duration is left at 0 (see track_to_song)
+						ends[stack.pop()] = abs_ticks
+					starts.append(abs_time)
+					durs.append(0.)
+					pitches.append(param1)
+					vels.append(param2)
+					chans.append(channel)
+					ticks.append(abs_ticks)
+					ends.append(abs_ticks)
+				elif type == 0x8:
+					stack = active.get((channel, param1))
+					if stack:
+						i = stack.pop()
+						durs[i] = abs_time - starts[i]
+						ends[i] = abs_ticks
+
+		# notes still sounding at the end of the track last until then
+		for stack in active.values():
+			for i in stack:
+				ends[i] = abs_ticks
+
+		notes = np.zeros(len(starts), NOTE_DTYPE)
+		notes['start'] = starts
+		notes['duration'] = durs
+		notes['pitch'] = pitches
+		notes['velocity'] = vels
+		notes['channel'] = chans
+		notes['tick'] = ticks
+		notes['end_tick'] = ends
+		return notes
 	
 	def __str__(self):
 		s = ""
@@ -182,24 +323,37 @@ def getdur(a, b):
 	"Calculate note length for PySynth"
 	return 4 / (b - a)
 
-if __name__ == "__main__":
-	import sys
-	m = MidiFile(sys.argv[1])
-	if len(sys.argv) > 2:
-		tracknum = int(sys.argv[2])
-	else:
-		tracknum = 1
-	if len(sys.argv) > 3:
-		filename = sys.argv[3]
-	else:
-		filename = "midi.wav"
-	print()
-	print("Track first notes")
-	for t, n in enumerate(m.tracks):
-		if len(n) > 0:
-			print(t, n[0], len(n))
+# lower case note names by MIDI pitch, as used in songs
+song_names = [(Note.note_names[(p - 9) % 12] + str(p // 12 - 1)).lower() for p in range(128)]
+
+def track_to_song(track, quantize = None, verbose = False):
+	"""Convert a track to a song in PySynth format.
+
+	track may be a NOTE_DTYPE array, a NoteList or a list of Notes.
+	If quantize is given, note starts and ends are rounded to a grid of
+	that many quarter notes (e.g. .25 for sixteenths) first."""
+	if isinstance(track, NoteList):
+		track = track.notes
+	elif not isinstance(track, np.ndarray):
+		notes = np.zeros(len(track), NOTE_DTYPE)
+		for f in ('start', 'duration', 'pitch', 'velocity', 'channel'):
+			notes[f] = [getattr(n, f) for n in track]
+		track = notes
+	starts = track['start']
+	stops = starts + track['duration']
+	if quantize:
+		starts = np.round(starts / quantize) * quantize
+		q_stops = np.round(stops / quantize) * quantize
+		# notes that had a length keep at least one grid step
+		stops = np.where((track['duration'] > 0) & (q_stops <= starts), starts + quantize, q_stops)
+
 	song = []
 	notes = {}
+	total = [0.]	# running length of the song so far
+
+	def add(x, y):
+		song.append((x, y))
+		total[0] += 4 / y
 
 	def getnote(q):
 		for x in q.keys():
@@ -207,58 +361,183 @@ if __name__ == "__main__":
 				return x
 		return None
 
-	def gettotal():
-		t = 0
-		for x, y in song:
-			t += 4 / y
-		return t
-
-	for n in m.tracks[tracknum]:
-		print(n)
-		nn = str(n).split()
-		start, stop = float(nn[2]), float(nn[3])
+	for i, (start, stop, pitch, vel) in enumerate(zip(starts.tolist(), stops.tolist(),
+			track['pitch'].tolist(), track['velocity'].tolist())):
+		if verbose:
+			n = track[i]
+			print(Note(int(n['channel']), pitch, vel, float(n['start']), float(n['duration'])))
+		name = song_names[pitch]
 
 		if start != stop:	# note ends because of NOTE OFF event
-			if start - gettotal() > 0:
-				song.append(('r', getdur(gettotal(), start)))
-				print("r1")
-			song.append((nn[0].lower(), getdur(start, stop)))
-		elif float(nn[1]) == 0 and notes.get(nn[0].lower(), -1) >= 0: # note ends because of NOTE ON with velocity = 0
-			if notes[nn[0].lower()] - gettotal() > 0:
-				song.append(('r', getdur(gettotal(), notes[nn[0].lower()])))
-				print("r2")
-			song.append((nn[0].lower(), getdur(notes[nn[0].lower()], start)))
-			notes[nn[0].lower()] = -1
-		elif float(nn[1]) > 0 and notes.get(nn[0].lower(), -1) == -1: # note ends because of new note
+			if start - total[0] > 0:
+				add('r', getdur(total[0], start))
+				if verbose:
+					print("r1")
+			add(name, getdur(start, stop))
+		elif vel == 0 and notes.get(name, -1) >= 0: # note ends because of NOTE ON with velocity = 0
+			if notes[name] - total[0] > 0:
+				add('r', getdur(total[0], notes[name]))
+				if verbose:
+					print("r2")
+			add(name, getdur(notes[name], start))
+			notes[name] = -1
+		elif vel > 0 and notes.get(name, -1) == -1: # note ends because of new note
 			old = getnote(notes)
 			if old != None:
 				if notes[old] != start:
-					song.append((old, getdur(notes[old], start)))
+					add(old, getdur(notes[old], start))
 				notes[old] = -1
-			elif start - gettotal() > 0:
-				song.append(('r', getdur(gettotal(), start)))
-				print("r3")
-			notes[nn[0].lower()] = start
+			elif start - total[0] > 0:
+				add('r', getdur(total[0], start))
+				if verbose:
+					print("r3")
+			notes[name] = start
+	return song
+
+def _render_track(job):
+	"""Render one track in a worker process, return its samples in shared memory.
+
+	The segment gets the name chosen by the parent, which unlinks it."""
+	num, song, synth, bpm, name = job
+	if isinstance(song, np.ndarray):
+		data, rate = synths.get_synth(synth).render_events(song, silent = True)
+	else:
+		data, rate = synths.get_synth(synth).render(song, bpm = bpm, silent = True)
+	data = np.asarray(data, dtype = np.float32)
+	shm = shared_memory.SharedMemory(name = name, create = True, size = max(1, data.nbytes))
+	np.ndarray(len(data), np.float32, shm.buf)[:] = data
+	shm.close()
+	return num, name, len(data), rate
+
+def _unlink_segment(name):
+	"Remove a shared memory segment if it exists."
+	try:
+		shm = shared_memory.SharedMemory(name = name)
+	except FileNotFoundError:
+		return
+	shm.close()
+	shm.unlink()
+
+def resample(x, rate, new_rate):
+	"Resample x from rate to new_rate with linear interpolation."
+	if rate == new_rate:
+		return x
+	n = int(len(x) * new_rate / float(rate))
+	return np.interp(np.arange(n) * (rate / float(new_rate)), np.arange(len(x)), x)
+
+def render_tracks(m, tracks = None, synth = "a", jobs = None, rate = 44100, quantize = None, use_events = False):
+	"""Render tracks of the MidiFile m in a process pool and mix them.
+
+	tracks is a list of track numbers or a dict of track number -> synth
+	name (default: every track with notes, all with the given synth).
+	jobs is the number of worker processes (default: one per CPU) and
+	quantize is passed on to track_to_song. The workers hand their
+	samples back through shared memory; tracks are resampled to rate if
+	necessary. Returns (float32 samples, rate), normalized to the peak
+	level of the synths.
+
+	With use_events, tracks for synths that have render_events() are
+	rendered polyphonically from m.events(), following all tempo changes."""
+	if tracks is None:
+		tracks = [t for t, n in enumerate(m.tracks) if len(n) > 0]
+	if not isinstance(tracks, dict):
+		tracks = dict((t, synth) for t in tracks)
+	todo = []
+	for t in sorted(tracks):
+		if use_events and hasattr(synths.get_synth(tracks[t]), "render_events"):
+			ev = m.events(t)
+			if len(ev):
+				todo.append((-(ev['start'] + ev['dur']).max(), (t, ev, tracks[t], m.tempo)))
+		else:
+			song = track_to_song(m.tracks[t], quantize)
+			if song:
+				todo.append((-sum(4. / y for x, y in song) * 60. / m.tempo, (t, song, tracks[t], m.tempo)))
+	# start the longest tracks first, so the total time is close to
+	#   the time of the longest track
+	todo = [j for l, j in sorted(todo, key = lambda j: j[0])]
+	# segment names are chosen here, so every segment a worker may have
+	#   created can be removed, even when another track failed
+	prefix = "pysynth_%u_%s_" % (os.getpid(), os.urandom(4).hex())
+	todo = [j + (prefix + str(j[0]),) for j in todo]
+
+	data = np.zeros(0)
+	# workers register their segments with the tracker of this process,
+	#   which removes them at exit should the unlinking below not happen
+	resource_tracker.ensure_running()
+	pool = multiprocessing.Pool(jobs)
+	try:
+		for num, name, n, r in pool.imap_unordered(_render_track, todo):
+			print("Track %u done" % num)
+			shm = shared_memory.SharedMemory(name = name)
+			try:
+				x = resample(np.ndarray(n, np.float32, shm.buf), r, rate)
+				if len(x) > len(data):
+					data = np.concatenate((data, np.zeros(len(x) - len(data))))
+				data[:len(x)] += x
+				del x
+			finally:
+				shm.close()
+				shm.unlink()
+	finally:
+		pool.close()
+		pool.join()
+		# (after join no worker can create a segment any more)
+		for j in todo:
+			_unlink_segment(j[-1])
+	if len(data) and abs(data).max() > 0:
+		data *= .5 / abs(data).max()
+	return data.astype(np.float32), rate
+
+if __name__ == "__main__":
+	import sys
+	m = MidiFile(sys.argv[1])
+	opts = [a for a in sys.argv[2:] if a.startswith("--")]
+	args = [a for a in sys.argv[2:] if not a.startswith("--")]
+	synth = synths.synth_name(opts)
+	quantize = None
+	for a in opts:
+		if a.startswith("--quantize="):
+			quantize = float(a[11:])
+
+	if "--all" in opts or [a for a in opts if a.startswith("--tracks=")]:
+		filename = args[0] if args else "midi.wav"
+		tracks, jobs = None, None
+		for a in opts:
+			if a.startswith("--tracks="):
+				tracks = {}
+				for t in a[9:].split(","):
+					num, sep, syn = t.partition(":")
+					tracks[int(num)] = syn or synth
+			elif a.startswith("--jobs="):
+				jobs = int(a[7:])
+		for t in (tracks or {}):
+			if not 0 <= t < len(m.tracks):
+				print("Error: no track %u in %s!" % (t, sys.argv[1]))
+				sys.exit(1)
+			if tracks[t] not in synths.synth_modules:
+				print("Error: unknown synth %s!" % tracks[t])
+				sys.exit(1)
+		data, rate = render_tracks(m, tracks, synth, jobs, quantize = quantize, use_events = "--events" in opts)
+		print("Writing to file", filename)
+		wavio.write_wav(filename, data, rate)
+		sys.exit(0)
+
+	if len(args) > 0:
+		tracknum = int(args[0])
+	else:
+		tracknum = 1
+	if len(args) > 1:
+		filename = args[1]
+	else:
+		filename = "midi.wav"
+	print()
+	print("Track first notes")
+	for t, n in enumerate(m.tracks):
+		if len(n) > 0:
+			print(t, n[0], len(n))
+	song = track_to_song(m.tracks[tracknum], quantize, verbose = True)
 	print()
 	print("Song")
 	print(song)
-	if "--syn_b" in sys.argv:
-		import pysynth_b as pysynth
-	elif "--syn_s" in sys.argv:
-		import pysynth_s as pysynth
-	elif "--syn_e" in sys.argv:
-		import pysynth_e as pysynth
-	elif "--syn_c" in sys.argv:
-		import pysynth_c as pysynth
-	elif "--syn_d" in sys.argv:
-		import pysynth_d as pysynth
-	elif "--syn_f" in sys.argv:
-		import pysynth_f as pysynth
-	elif "--syn_p" in sys.argv:
-		import pysynth_p as pysynth
-	elif "--syn_samp" in sys.argv:
-		import pysynth_samp as pysynth
-	else:
-		import pysynth
+	pysynth = synths.get_synth(synth)
 	pysynth.make_wav(song, fn = filename, bpm = m.tempo)
-
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+# Timing statistics for the live MIDI synths (multi_synth.py, midi_synth.py)
+
+# The audio callback calls record() once per block; all values go into
+# preallocated ring buffers, so recording does not allocate memory.
+# summary() and report() are meant for the main loop, dump() for the end:
+#
+#   mon = rtstats.PerfMonitor(rate = 44100)
+#   ...
+#   t0 = time.perf_counter()
+#   (render the block)
+#   mon.record(t0, time.perf_counter(), frame_count, voices, status, latency)
+#   ...
+#   print(mon.report())
+#   mon.dump("rtstats.csv")		# or .json
+
+from __future__ import division
+
+import json
+import numpy as np
+
+# PortAudio callback status flags
+STATUS_FLAGS = {
+	1: "input_underflow",
+	2: "input_overflow",
+	4: "output_underflow",
+	8: "output_overflow",
+	16: "priming_output",
+}
+
+FIELDS = ("time", "compute", "budget", "voices", "status", "latency")
+
+class PerfMonitor(object):
+	"""Ring buffer of per-block timing data
+
+	For each block it keeps the callback start time, the compute time,
+	the time budget (block length in seconds), the number of voices,
+	the PortAudio status flags and the largest MIDI-to-audio latency of
+	the events played in the block (NaN if there were none). Only the
+	last size blocks are kept."""
+
+	def __init__(self, size = 8192, rate = 44100):
+		self.size = size
+		self.rate = rate
+		self.time = np.zeros(size)
+		self.compute = np.zeros(size)
+		self.budget = np.zeros(size)
+		self.voices = np.zeros(size, np.int16)
+		self.status = np.zeros(size, np.int32)
+		self.latency = np.zeros(size)
+		self.count = 0		# blocks recorded in total
+		self.xruns = 0		# blocks with an under- or overflow flag
+
+	def record(self, start, end, frame_count, voices = 0, status = 0, latency = float('nan')):
+		"Store the data for one block (start and end are perf_counter() times)."
+		i = self.count % self.size
+		self.time[i] = start
+		self.compute[i] = end - start
+		self.budget[i] = frame_count / self.rate
+		self.voices[i] = voices
+		self.status[i] = status
+		self.latency[i] = latency
+		if status & 15:
+			self.xruns += 1
+		self.count += 1
+
+	def columns(self):
+		"Return the recorded data, oldest block first, as a dict of arrays."
+		n = min(self.count, self.size)
+		order = (np.arange(n) + self.count - n) % self.size
+		return dict((f, getattr(self, f)[order]) for f in FIELDS)
+
+	def summary(self, pct = (50, 90, 99)):
+		"""Return percentiles of load (compute time / budget), compute time
+		and latency in ms, the voice counts and the number of xruns."""
+		c = self.columns()
+		out = {"blocks": self.count, "xruns": self.xruns}
+		if not len(c["time"]):
+			return out
+		load = c["compute"] / c["budget"]
+		lat = c["latency"][~np.isnan(c["latency"])]
+		out["load"] = dict(("p%u" % p, float(np.percentile(load, p))) for p in pct)
+		out["load"]["max"] = float(load.max())
+		out["compute_ms"] = dict(("p%u" % p, 1000 * float(np.percentile(c["compute"], p))) for p in pct)
+		out["compute_ms"]["max"] = 1000 * float(c["compute"].max())
+		out["voices"] = {"mean": float(c["voices"].mean()), "max": int(c["voices"].max())}
+		if len(lat):
+			out["latency_ms"] = dict(("p%u" % p, 1000 * float(np.percentile(lat, p))) for p in pct)
+			out["latency_ms"]["max"] = 1000 * float(lat.max())
+		flags = np.bitwise_or.reduce(c["status"])
+		out["status"] = [name for bit, name in sorted(STATUS_FLAGS.items()) if flags & bit]
+		return out
+
+	def report(self):
+		"One-line summary for printing."
+		s = self.summary()
+		if "load" not in s:
+			return "no blocks recorded"
+		r = "%u blocks, load p50 %.0f%% p99 %.0f%% max %.0f%%, voices max %u, xruns %u" % (
+			s["blocks"], 100 * s["load"]["p50"], 100 * s["load"]["p99"],
+			100 * s["load"]["max"], s["voices"]["max"], s["xruns"])
+		if "latency_ms" in s:
+			r += ", latency p50 %.1f ms max %.1f ms" % (s["latency_ms"]["p50"], s["latency_ms"]["max"])
+		return r
+
+	def dump(self, fn):
+		"""Write the recorded blocks to a CSV file, or to a JSON file
+		together with the summary if fn ends in .json."""
+		c = self.columns()
+		if fn.endswith(".json"):
+			with open(fn, "w") as f:
+				# (NaN is not valid JSON, blocks without events get null)
+				blocks = dict((k, v.tolist()) for k, v in c.items())
+				blocks["latency"] = [None if x != x else x for x in blocks["latency"]]
+				json.dump({"summary": self.summary(), "blocks": blocks}, f, indent = 1)
+			return
+		with open(fn, "w") as f:
+			f.write(",".join(FIELDS) + "\n")
+			for row in zip(*[c[k] for k in FIELDS]):
+				f.write("%.6f,%.6f,%.6f,%u,%u,%.6f\n" % row)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+# Process-wide bank of decoded sample files (used by PySynth samp)
+
+import os, wave
+import numpy as np
+import diskcache
+from lrucache import LRUCache
+
+# bump when the decoding changes (invalidates the disk cache)
+cache_version = 2
+
+def decode_pcm24(raw, nchannels = 1, channel = 0):
+	"Decode one channel of little-endian 24-bit PCM data to int32."
+	b = np.frombuffer(raw, np.uint8)
+	b = b[:len(b) - len(b) % (3 * nchannels)].reshape(-1, 3 * nchannels)
+	# put the three bytes into the top of a 32-bit word, then shift
+	#   back down to sign-extend
+	w = np.zeros((len(b), 4), np.uint8)
+	w[:, 1:] = b[:, 3 * channel:3 * channel + 3]
+	return w.view('<i4')[:, 0] >> 8
+
+def pcm24_to_float(d):
+	"""Scale decoded 24-bit samples to float32 in [-1, 1].
+
+	Same scaling and sign as the original per-sample decoder, which
+	also mapped the most negative value 0x800000 to -1."""
+	return np.where(d == -8388608, -1., -d / 8388608.).astype(np.float32)
+
+class SampleBank(object):
+	"Decodes each WAV file once and keeps it as a float32 array."
+
+	def __init__(self, max_bytes = 512 * 2**20):
+		self.cache = LRUCache(max_bytes)
+
+	def load(self, fn, channel = 0, div = 1):
+		"""Return channel of the 24-bit WAV file fn, scaled to [-1, 1] (read-only).
+
+		Only the first 1/div of the file is decoded and kept."""
+		key = os.path.abspath(fn), channel, div
+		new = self.cache.get(key)
+		if new is None:
+			dc = diskcache.get_cache()
+			if dc is not None:
+				st = os.stat(fn)
+				dkey = ('samp', cache_version) + key + (st.st_size, st.st_mtime)
+				new = dc.get(dkey)
+				if new is not None:
+					self.cache.put(key, new)
+					return new
+			wf = wave.open(fn, "rb")
+			try:
+				nch = wf.getnchannels()
+				wd = wf.readframes(wf.getnframes() // div)
+			finally:
+				wf.close()
+			new = pcm24_to_float(decode_pcm24(wd, nch, channel))
+			new.flags.writeable = False
+			self.cache.put(key, new)
+			if dc is not None:
+				dc.put(dkey, new)
+		return new
+
+	def set_limit(self, max_bytes):
+		"Change the memory ceiling of the bank."
+		self.cache.set_limit(max_bytes)
+
+	def stats(self):
+		"Return hit, miss and byte statistics."
+		return self.cache.stats()
+
+	def clear(self):
+		self.cache.clear()
+
+# shared by all renders in this process
+bank = SampleBank()
@@ -8,7 +8,7 @@ setup(name="PySynth",
         author="Martin C. Doege",
         author_email="mdoege@compuserve.com",
 	url="http://mdoege.github.io/PySynth/",
-        py_modules=["pysynth", "pysynth_b", "pysynth_c", "pysynth_d", "pysynth_e", "pysynth_f", "pysynth_p", "pysynth_s", "pysynth_beeper", "pysynth_samp", "play_wav", "mixfiles", "mkfreq", "demosongs"],
+        py_modules=["pysynth", "pysynth_b", "pysynth_c", "pysynth_d", "pysynth_e", "pysynth_f", "pysynth_p", "pysynth_s", "pysynth_beeper", "pysynth_samp", "subsynth", "blockstream", "events", "synths", "lrucache", "samplebank", "notecache", "diskcache", "wavio", "rtstats", "polysynth", "offline_synth", "wavetable", "bench", "play_wav", "mixfiles", "mkfreq", "demosongs"],
 	scripts=["read_abc.py", "readmidi.py", "nokiacomposer2wav.py", "test_nokiacomposer2wav.py", "menv.py", "midi_synth.py", "multi_synth.py"],
 )
 
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+# Shared engine for the subtractive synths PySynth C, D and F:
+#   an oscillator stage (computed for a whole note at once)
+#   followed by a one-pole low-pass filter
+
+from __future__ import division
+
+import math
+import numpy as np
+import wavio
+from wavetable import saw_table, triangle_table
+# (the note list is read exactly as by PySynth A)
+from pysynth import song_notes
+
+def wavetable_osc(wt):
+	"Return an oscillator that reads the given wavetable without interpolation."
+	wt = np.asarray(wt, dtype = float)
+	def osc(hz, x):
+		p = 2 * math.pi * x / 44100 * hz
+		pind = ((p % (2 * math.pi)) / (2 * math.pi) * len(wt)).astype(int)
+		return wt[pind % len(wt)]
+	return osc
+
+def square_osc(hz, x):
+	"Square wave oscillator (PySynth D)."
+	halfp = 44100. / hz / 2.
+	return np.where((x // halfp) % 2, 1., -1.)
+
+# The filter sp += (x - sp) / k is y[n] = c * y[n-1] + (1 - c) * x[n]
+# with c = 1 - 1/k, so inside a block starting with state y0
+#     y[n] = c**(n+1) * y0 + (1 - c) * sum(c**(n-m) * x[m], m = 0..n),
+# which is a cumulative sum. Blocks are kept short enough that c**-n
+# cannot overflow, and the last output is carried over as the state
+# of the next block.
+
+lp_block = 4096
+
+def lowpass(x, k, sp = 0.):
+	"One-pole low-pass filter; returns (filtered signal, final state)."
+	if k < 1:
+		raise ValueError("low-pass factor k must be at least 1")
+	c = 1. - 1. / k
+	if c == 0:
+		return np.array(x, dtype = float), x[-1] if len(x) else sp
+	bl = max(1, min(lp_block, int(200. / -math.log(c))))
+	y = np.empty(len(x))
+	ramp = c ** -np.arange(bl)
+	for i in range(0, len(x), bl):
+		xb = x[i:i+bl]
+		n = len(xb)
+		acc = np.cumsum(xb * ramp[:n]) * (1. - c)
+		y[i:i+n] = (acc + c * sp) / ramp[:n]
+		sp = y[i+n-1]
+	return y, sp
+
+def render_note(osc, k, gain, hz, q, vol):
+	"Oscillator, low-pass and fade-out for one note of q samples."
+	x = np.arange(q)
+	sp, _ = lowpass(osc(hz, x), k)
+	fade = np.ones(q)
+	fade[x > q - 100] = (q - x[x > q - 100]) / 100.
+	return gain * fade * vol * sp
+
+def _pieces(song, osc, k, gain, bpm, transpose, pause, boost, repeat, silent):
+	"Yield the song as consecutive float64 arrays, one note or rest at a time."
+	curpos = 0
+	ex_pos = 0.
+	for a, b, vol in song_notes(song, bpm, transpose, boost, repeat, silent):
+		ex_pos = ex_pos + b
+		if a is None:
+			yield np.zeros(int(b))
+			curpos = curpos + int(b)
+			continue
+		b2 = (1.-pause)*b
+		q = int(44100./a * round(float(b2)/44100.*a))
+		fill = max(int(ex_pos - curpos - q), 0)
+		yield render_note(osc, k, gain, a, q, vol)
+		yield np.zeros(fill)
+		curpos = curpos + q + fill
+
+def render(song, osc, k, gain, bpm=120,transpose=0,pause=.05,boost=1.1,repeat=0, silent=False):
+	"Render song in memory, return (float32 samples with 1.0 = full scale, sample rate)."
+	out = _pieces(song, osc, k, gain, bpm, transpose, pause, boost, repeat, silent)
+	return np.concatenate([np.zeros(0)] + list(out)).astype(np.float32), 44100
+
+def make_wav(song, osc, k, gain, bpm=120,transpose=0,pause=.05,boost=1.1,repeat=0,fn="out.wav", silent=False):
+	"Render a song with the given oscillator, filter constant and output gain."
+	if silent == False:
+		print("Writing to file", fn)
+	# written note by note, so memory use does not grow with the song
+	wavio.write_wav_blocks(fn, _pieces(song, osc, k, gain, bpm, transpose, pause, boost, repeat, silent), 44100)
+	print()
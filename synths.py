@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+
+# Select a PySynth module by name or by command line flag
+#   (--syn_b, --syn_c, ... as accepted by read_abc.py and readmidi.py)
+
+import importlib
+
+synth_modules = {
+	"a": "pysynth",
+	"b": "pysynth_b",
+	"c": "pysynth_c",
+	"d": "pysynth_d",
+	"e": "pysynth_e",
+	"f": "pysynth_f",
+	"p": "pysynth_p",
+	"s": "pysynth_s",
+	"samp": "pysynth_samp",
+}
+
+def get_synth(name):
+	"Import and return the synth module for a name like 'b' or 'samp'."
+	if name not in synth_modules:
+		raise ValueError("unknown synth: %s" % name)
+	return importlib.import_module(synth_modules[name])
+
+def synth_name(argv):
+	"Return the synth name selected by a --syn_* flag in argv (default 'a')."
+	for a in argv:
+		if a.startswith("--syn_") and a[6:] in synth_modules:
+			return a[6:]
+	return "a"
@@ -0,0 +1,31 @@
+from unittest import TestCase
+
+import bench
+
+class TestBench(TestCase):
+    def test_songs(self):
+        self.assertIn("song4_lh", bench.demo_songs())
+        s = bench.scale_song(100)
+        self.assertEqual(len(s), 100)
+        self.assertEqual(s[0], ('c3', 8))
+        self.assertEqual(s[35], ('b5', 8))
+        self.assertEqual(s[36], ('a#5', 8))
+        self.assertEqual(bench.beeper_song([('g*', -8), ('r', 4), ('a3', 2)]),
+            [('g4', 8 / 1.5), ('r', 4), ('a3', 2)])
+
+    def test_measure_and_compare(self):
+        r = bench.measure("c", "scale", scale = 4)
+        self.assertEqual((r["synth"], r["song"], r["notes"]), ("c", "scale", 4))
+        self.assertAlmostEqual(r["rtf"], r["audio_s"] / r["wall_s"])
+        self.assertGreater(r["peak_rss_mb"], 1)
+
+        base = {"results": [dict(r, wall_s = r["wall_s"] / 2), dict(r, song = "song1")]}
+        new = [dict(r), dict(r, song = "song2")]
+        self.assertEqual(bench.compare(new, base), 1)
+        self.assertEqual(new[0]["flags"], ["slower"])
+        self.assertAlmostEqual(new[0]["change"], 2.)
+        self.assertNotIn("change", new[1])
+        base = {"results": [dict(r, wall_s = r["wall_s"] * 2)]}
+        new = [dict(r)]
+        self.assertEqual(bench.compare(new, base), 0)
+        self.assertEqual(new[0]["flags"], ["faster"])
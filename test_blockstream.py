@@ -0,0 +1,45 @@
+from unittest import TestCase
+
+import numpy as np
+
+import blockstream
+
+class TestIterBlocks(TestCase):
+    def notes(self):
+        rng = np.random.RandomState(5)
+        pos = 0
+        for n in range(40):
+            yield pos, rng.uniform(-1., 1., rng.randint(100, 3000))
+            pos += rng.randint(0, 700)
+        yield pos + .3, None
+
+    def test_fixed_gain_matches_overlap_add(self):
+        data, out_len = blockstream.overlap_add(self.notes(), 1000)
+        blocks = list(blockstream.iter_blocks(self.notes(), 1000, block_size = 256, gain = .2))
+        self.assertTrue(all(len(b) == 256 for b in blocks[:-1]))
+        self.assertEqual(sum(len(b) for b in blocks), out_len)
+        np.testing.assert_array_equal(np.concatenate(blocks), blockstream.to_pcm(.2 * data[:out_len]))
+
+    def test_limiter(self):
+        data, out_len = blockstream.overlap_add(self.notes(), 1000)
+        y = np.concatenate(list(blockstream.iter_blocks(self.notes(), 1000, block_size = 300, drive = 1.)))
+        self.assertEqual(len(y), out_len)
+        self.assertLessEqual(np.abs(y).max(), 16000)
+        # signals below the ceiling pass unchanged
+        y = np.concatenate(list(blockstream.iter_blocks(self.notes(), 1000, block_size = 300, drive = .01)))
+        np.testing.assert_array_equal(y, blockstream.to_pcm(.01 * data[:out_len]))
+
+class TestLimiter(TestCase):
+    def test_gain_ramps_before_transient(self):
+        rate = 44100
+        x = .4 * np.sin(2 * np.pi * 440. / rate * np.arange(4000))
+        x[2000:2005] = 3.
+        lim = blockstream.Limiter(ceiling = .5, lookahead = 441)
+        y = np.concatenate([lim.process(x[i:i+700]) for i in range(0, len(x), 700)] + [lim.flush()])
+        self.assertEqual(len(y), len(x))
+        self.assertLessEqual(np.abs(y).max(), .5 + 1e-12)
+        # no gain step: before the transient the output changes about
+        #   as slowly as the sine itself (at most .025 per sample)
+        self.assertLess(np.abs(np.diff(y[:2000])).max(), .027)
+        # the gain only starts to go down within the look-ahead window
+        np.testing.assert_array_equal(y[:1558], x[:1558])
@@ -0,0 +1,50 @@
+from unittest import TestCase
+import os, shutil, tempfile
+
+import numpy as np
+
+import diskcache
+
+class TestDiskCache(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_roundtrip(self):
+        dc = diskcache.DiskCache(self.dir)
+        x = np.arange(100.)
+        dc.put(('b', 1, 'c4'), x)
+        self.assertEqual([f for f in os.listdir(self.dir) if not f.endswith('.npy')], [])
+        y = dc.get(('b', 1, 'c4'))
+        self.assertIsInstance(y, np.memmap)
+        self.assertFalse(y.flags.writeable)
+        np.testing.assert_array_equal(y, x)
+        # a new engine version is a different key
+        self.assertIsNone(dc.get(('b', 2, 'c4')))
+        self.assertEqual((dc.hits, dc.misses, dc.writes), (1, 1, 1))
+
+    def test_size_cap(self):
+        probe = diskcache.DiskCache(self.dir)
+        probe.put('probe', np.zeros(100))
+        fsize = os.path.getsize(probe.filename('probe'))
+        probe.clear()
+        self.assertEqual(probe.size, 0)
+
+        dc = diskcache.DiskCache(self.dir, max_bytes = 2 * fsize)
+        scans = []
+        cleanup = dc.cleanup
+        dc.cleanup = lambda: (scans.append(1), cleanup())
+        for i in range(3):
+            dc.put(i, np.full(100, float(i)))
+            os.utime(dc.filename(i), (1000 + i, 1000 + i))
+        # one scan to get the initial size, one when the cap was exceeded
+        self.assertEqual(len(scans), 2)
+        self.assertEqual(dc.size, 2 * fsize)
+        self.assertEqual(dc.removed, 1)
+        self.assertIsNone(dc.get(0))
+        np.testing.assert_array_equal(dc.get(2), np.full(100, 2.))
+        # replacing a file does not change the size
+        dc.put(2, np.zeros(100))
+        self.assertEqual((len(scans), dc.size), (2, 2 * fsize))
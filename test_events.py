@@ -0,0 +1,31 @@
+from unittest import TestCase
+
+import events
+
+class TestEvents(TestCase):
+    def test_make_events(self):
+        ev = events.make_events([(1., .5, 'e', 1.), (0., 1., 'c#4', 1.2), (1., .5, 60, .8)])
+        self.assertEqual(list(ev['start']), [0., 1., 1.])
+        self.assertEqual(list(ev['pitch']), [61, 64, 60])
+        self.assertEqual(events.note_name(61), 'c#4')
+        self.assertEqual(events.note_name(21), 'a0')
+
+    def test_from_song(self):
+        ev = events.from_song((('c', 4), ('r', 4), ('g*', -4), ('c5', 8)), bpm = 60)
+        self.assertEqual(list(ev['start']), [0., 2., 3.5])
+        self.assertEqual(list(ev['dur']), [1., 1.5, .5])
+        self.assertAlmostEqual(ev['vel'][1], 1.1, places = 6)
+        self.assertEqual(list(ev['pitch']), [60, 67, 72])
+
+    def test_render_edge_cases(self):
+        import numpy as np
+        import pysynth_b
+        data, rate = pysynth_b.render_events(events.make_events([]), silent = True)
+        self.assertFalse(np.isnan(data).any())
+        self.assertEqual(len(data), 2 * rate)
+        # pitches outside the piano range are skipped
+        ev = events.make_events([(0., .2, 12, 1.), (0., .2, 60, 1.), (.1, .2, 120, 1.)])
+        data, rate = pysynth_b.render_events(ev, silent = True)
+        ref, rate = pysynth_b.render_events(ev[ev['pitch'] == 60], silent = True)
+        self.assertEqual(len(data), len(ref) + int(.1 * rate))
+        np.testing.assert_array_equal(data[:len(ref)], ref)
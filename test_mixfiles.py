@@ -0,0 +1,97 @@
+import os, random, shutil, struct, tempfile, wave
+from unittest import TestCase
+
+import mixfiles
+
+class TestMixFrames(TestCase):
+    def setUp(self):
+        random.seed(3)
+        n = 500
+        vals = [random.randint(-32768, 32767) for x in range(2 * n)]
+        # include full-scale values where the cross-feed can overflow
+        vals[:4] = [32767, 32767, -32768, -32768]
+        self.frames = n
+        self.d1 = struct.pack('<%uh' % n, *vals[:n])
+        self.d2 = struct.pack('<%uh' % n, *vals[n:])
+
+    def check(self, chann, phase):
+        fast = mixfiles.mix_frames(self.d1, self.d2, self.frames, chann, phase)
+        self.assertEqual(len(fast), 2 * chann * self.frames)
+        for n, x in enumerate(struct.unpack('<%uh' % (chann * self.frames), fast)):
+            a = struct.unpack('<h', self.d1[2*(n//chann):2*(n//chann)+2])[0]
+            b = struct.unpack('<h', self.d2[2*(n//chann):2*(n//chann)+2])[0]
+            if chann < 2:
+                v = int(.5 * (a + b))
+            elif n % 2:
+                v = int(.7 * a + phase * .3 * b)
+            else:
+                v = int(phase * .3 * a + .7 * b)
+            self.assertEqual(x, max(-32768, min(32767, v)))
+
+    def test_stereo(self):
+        self.check(2, -1.)
+        self.check(2, 1.)
+
+    def test_mono(self):
+        self.check(1, -1.)
+
+    def test_full_scale(self):
+        # loud input clips the same way with and without NumPy
+        n = 4
+        d1 = struct.pack('<%uh' % n, 32767, -32768, 32767, -32768)
+        d2 = struct.pack('<%uh' % n, 32767, -32768, -32768, 32767)
+        for chann, phase in (1, -1.), (2, -1.), (2, 1.), (2, 2.):
+            self.assertEqual(mixfiles.mix_frames_py(d1, d2, n, chann, phase),
+                mixfiles.mix_frames(d1, d2, n, chann, phase))
+        out = struct.unpack('<8h', mixfiles.mix_frames_py(d1, d2, n, 2, 2.))
+        self.assertEqual(out[:2], (32767, 32767))
+
+class TestMixTracks(TestCase):
+    def write(self, fn, chann, frames):
+        w = wave.open(fn, 'w')
+        w.setnchannels(chann)
+        w.setsampwidth(2)
+        w.setframerate(44100)
+        w.writeframes(struct.pack('<%uh' % len(frames), *frames))
+        w.close()
+
+    def test_pad_pan_offset(self):
+        d = tempfile.mkdtemp()
+        try:
+            st, mo, out = [os.path.join(d, x) for x in ('st.wav', 'mo.wav', 'out.wav')]
+            self.write(st, 2, [100, 200] * 10)
+            self.write(mo, 1, [1000] * 5)
+            mixfiles.mix_tracks([st, (mo, .5, -1., 12 / 44100.)], out, block = 4)
+            w = wave.open(out)
+            self.assertEqual(w.getnchannels(), 2)
+            x = struct.unpack('<%uh' % (2 * w.getnframes()), w.readframes(w.getnframes()))
+            w.close()
+        finally:
+            shutil.rmtree(d)
+        self.assertEqual(len(x), 2 * 17)
+        self.assertEqual(x[:2], (100, 200))
+        self.assertEqual(x[20:24], (0, 0, 0, 0))
+        self.assertEqual(x[24:26], (707, 0))
+        self.assertEqual(x[-2:], (707, 0))
+
+    def test_negative_offset(self):
+        d = tempfile.mkdtemp()
+        try:
+            mo, out = [os.path.join(d, x) for x in ('mo.wav', 'out.wav')]
+            self.write(mo, 1, list(range(0, 1000, 100)))
+            mixfiles.mix_tracks([(mo, 1., 0., -3 / 44100.)], out, block = 4)
+            w = wave.open(out)
+            x = struct.unpack('<%uh' % (2 * w.getnframes()), w.readframes(w.getnframes()))
+            w.close()
+        finally:
+            shutil.rmtree(d)
+        # the first three frames are skipped
+        self.assertEqual(x[::2], (300, 400, 500, 600, 700, 800, 900))
+
+    def test_needs_numpy(self):
+        np = mixfiles.np
+        mixfiles.np = None
+        try:
+            self.assertRaises(SystemExit, mixfiles.mix_tracks, ['x.wav'], 'out.wav')
+        finally:
+            mixfiles.np = np
@@ -0,0 +1,29 @@
+from unittest import TestCase
+
+import notecache, pysynth_e
+
+class TestNoteCache(TestCase):
+    def setUp(self):
+        notecache.clear()
+
+    def tearDown(self):
+        notecache.set_limit(256 * 2**20)
+        notecache.clear()
+
+    def test_reuse_across_renders(self):
+        song = (('c', 8), ('e*', 8), ('c', 4), ('g3', 8))
+        first, rate = pysynth_e.render(song, silent = True)
+        s = notecache.stats()
+        # the second c is already a hit
+        self.assertEqual((s["hits"], s["misses"], s["entries"]), (1, 3, 3))
+        second, rate = pysynth_e.render(song, silent = True)
+        s = notecache.stats()
+        self.assertEqual((s["hits"], s["misses"]), (5, 3))
+        self.assertEqual(first.tobytes(), second.tobytes())
+
+        notecache.set_limit(s["bytes"] // 2)
+        s = notecache.stats()
+        self.assertGreater(s["evictions"], 0)
+        self.assertLess(s["entries"], 3)
+        notecache.clear()
+        self.assertEqual(notecache.stats()["entries"], 0)
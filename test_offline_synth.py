@@ -0,0 +1,71 @@
+from unittest import TestCase
+import os, tempfile
+
+import numpy as np
+
+import offline_synth, polysynth, readmidi
+from test_readmidi import write_midi
+
+class Msg(object):
+    def __init__(self, type, note, velocity, time):
+        self.type, self.note, self.velocity, self.time = type, note, velocity, time
+
+class TestOfflineSynth(TestCase):
+    def test_messages(self):
+        msgs = [Msg("note_on", 60, 100, 0.), Msg("note_on", 64, 100, .1),
+            Msg("note_on", 60, 0, .2), Msg("note_off", 64, 0, .1)]
+        self.assertEqual(offline_synth.timed_messages(msgs),
+            [(0., "on", 60), (.1, "on", 64), (.1 + .2, "off", 60), (.1 + .2 + .1, "off", 64)])
+        data, rtf = offline_synth.render(msgs, tail = .5)
+        self.assertEqual(len(data), int((.4 + .5) * 44100))
+        self.assertGreater(rtf, 0)
+
+        # same as playing the voices directly, with the second note
+        #   one block late
+        v = polysynth.VoicePool(8)
+        v.note_on(60)
+        ref = v.render(4410 + 128)
+        v.note_on(64)
+        ref = np.concatenate((ref, v.render(1000)))
+        np.testing.assert_array_equal(data[:5538], np.clip(np.round(3000 * ref), -32768, 32767))
+
+    def test_midi_file(self):
+        fd, fn = tempfile.mkstemp(suffix = '.mid')
+        os.close(fd)
+        # 120 bpm, 480 ticks per quarter: two overlapping notes
+        write_midi(fn, [[(0, b'\x90\x3c\x50'), (120, b'\x90\x40\x50'),
+            (120, b'\x80\x3c\x00'), (120, b'\x80\x40\x00')]], div = 480)
+        try:
+            m = readmidi.MidiFile(fn)
+        finally:
+            os.remove(fn)
+        self.assertEqual(offline_synth.midi_messages(m),
+            [(0., "on", 60), (.125, "on", 64), (.25, "off", 60), (.375, "off", 64)])
+        data, rtf = offline_synth.render(m, maxpoly = 1, tail = 0.)
+        self.assertEqual(len(data), int(.375 * 44100))
+
+    def test_custom_voices(self):
+        # the engine cuts the block at the event offset for any voice object
+        class Voice(object):
+            def __init__(self):
+                self.level, self.events = 0., []
+            def note_on(self, key):
+                self.level = 1.
+                self.events.append(("on", key))
+            def note_off(self, key):
+                self.level = 0.
+            def playing(self):
+                return int(self.level > 0)
+            def render(self, n):
+                return np.full(n, self.level)
+
+        voice = Voice()
+        stream = offline_synth.OfflineStream(None, 44100, 128)
+        engine = polysynth.Engine(volume = 1000, clock = stream.clock, voices = voice)
+        stream.callback = engine.callback
+        engine.note_on(60, 200 / 44100.)
+        out = stream.run(384)
+        self.assertEqual(voice.events, [("on", 60)])
+        # played one block late, at the same offset into the block
+        self.assertEqual(list(np.flatnonzero(out)[:1]), [328])
+        self.assertEqual(out[-1], 1000)
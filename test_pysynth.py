@@ -0,0 +1,29 @@
+import os, tempfile, wave
+from unittest import TestCase
+
+import pysynth
+
+class TestRenderA(TestCase):
+    def render(self, song, **kw):
+        fd, fn = tempfile.mkstemp(suffix = ".wav")
+        os.close(fd)
+        try:
+            pysynth.make_wav(song, fn = fn, silent = True, **kw)
+            w = wave.open(fn)
+            return w.readframes(w.getnframes())
+        finally:
+            os.remove(fn)
+
+    def test_numpy_matches_loop(self):
+        song = (('c', 8), ('e*', 16), ('r', 16), ('g3', -4), ('c6', 8))
+        fast = self.render(song, bpm = 150)
+        np = pysynth.np
+        pysynth.np = None
+        try:
+            slow = self.render(song, bpm = 150)
+        finally:
+            pysynth.np = np
+        self.assertEqual(len(fast), len(slow))
+        a = memoryview(fast).cast('h')
+        b = memoryview(slow).cast('h')
+        self.assertLessEqual(max(abs(x - y) for x, y in zip(a, b)), 1)
@@ -0,0 +1,25 @@
+from unittest import TestCase
+
+import numpy as np
+
+import pysynth_s
+
+class TestKarplusStrong(TestCase):
+    def test_block_matches_loop(self):
+        # a0 has a period of about 1604 samples, c#5 one of 79.5
+        song = (('a0', 16), ('c#5', 8), ('e*', 16), ('r', 16), ('g3', -8))
+        out = {}
+        for eng in "loop", "block":
+            np.random.seed(7)
+            out[eng], rate = pysynth_s.render(song, bpm = 200, silent = True, ks_engine = eng)
+        self.assertEqual(len(out["loop"]), len(out["block"]))
+        np.testing.assert_array_equal(out["loop"], out["block"])
+
+    def test_fractional_period(self):
+        rng = np.random.RandomState(2)
+        for delt in 1603.64, 79.51, 2.5:
+            kps1 = np.zeros(6000)
+            kps1[:int(delt)] = rng.normal(size = int(delt))
+            a = pysynth_s.ks_loop(kps1, int(delt), delt, .999, 10)
+            b = pysynth_s.ks_block(kps1, int(delt), delt, .999, 10)
+            np.testing.assert_allclose(a, b, rtol = 0, atol = 1e-12)
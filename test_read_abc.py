@@ -0,0 +1,59 @@
+import os, shutil, tempfile, time
+from unittest import TestCase
+
+import read_abc
+
+book = """%abc songbook
+X:1
+T:First
+L:1/8
+K:G
+GABG DGBG|c2B2 A2G2|
+
+X:3
+T:Second
+M:3/4
+L:1/4
+K:F
+B>c d|e2 f-|f z2|
+"""
+
+class TestReadABC(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.fn = os.path.join(self.dir, 'book.abc')
+        with open(self.fn, 'w') as f:
+            f.write(book)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_index(self):
+        index = read_abc.load_index(self.fn)
+        self.assertEqual(sorted(index), [1, 3])
+        self.assertTrue(os.path.exists(self.fn + '.idx'))
+        with open(self.fn, 'rb') as f:
+            f.seek(index[3])
+            self.assertEqual(f.readline(), b'X:3\n')
+        # the cached index is rebuilt when the file changes
+        with open(self.fn, 'a') as f:
+            f.write("\nX:4\nK:C\nCDEF|\n")
+        os.utime(self.fn, (time.time() + 10, time.time() + 10))
+        self.assertEqual(sorted(read_abc.load_index(self.fn)), [1, 3, 4])
+
+    def test_read_tune(self):
+        t = read_abc.read_tune(self.fn, 3)
+        self.assertEqual((t.title, t.key, t.meter, t.unit), ('Second', 'F', '3/4', 4))
+        self.assertEqual(t.song, read_abc.parse_tune(book.splitlines(True), 3).song)
+        self.assertEqual(t.song[:2], [['bb4', 4. / 1.5], ['c5', 8.]])
+        self.assertEqual(read_abc.read_tune(self.fn, 1).song[0], ['g4', 8.])
+        self.assertIsNone(read_abc.read_tune(self.fn, 2))
+
+    def test_render_songbook(self):
+        lines = (book + "\nX:5\nL:1/x\nK:C\nCDE|\n").splitlines(True)
+        out = os.path.join(self.dir, 'out')
+        s = read_abc.render_songbook(lines, out, 'book', jobs = 2)
+        self.assertEqual([t['num'] for t in s['tunes']], [1, 3])
+        self.assertEqual([(f['num'], f['stage']) for f in s['failures']], [(5, 'parse')])
+        self.assertTrue(os.path.exists(os.path.join(out, 'book_3.wav')))
+        self.assertTrue(os.path.exists(os.path.join(out, 'summary.json')))
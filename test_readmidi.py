@@ -0,0 +1,87 @@
+import os, struct, tempfile
+from unittest import TestCase
+
+import readmidi
+
+def write_midi(fn, tracks, div = 480):
+    "Write a format 1 MIDI file; tracks are lists of (delta, event bytes)."
+    with open(fn, 'wb') as f:
+        f.write(b'MThd' + struct.pack('>ihhh', 6, 1, len(tracks), div))
+        for t in tracks:
+            d = b''.join(bytes([dt]) + e for dt, e in t) + b'\x00\xff\x2f\x00'
+            f.write(b'MTrk' + struct.pack('>i', len(d)) + d)
+
+class TestReadMidi(TestCase):
+    def setUp(self):
+        fd, self.fn = tempfile.mkstemp(suffix = '.mid')
+        os.close(fd)
+        # 60 ticks per quarter: c4 e4 g4 quarters, and one half note a3
+        write_midi(self.fn, [
+            [(0, b'\x90\x3c\x50'), (60, b'\x80\x3c\x00'), (0, b'\x90\x40\x50'), (60, b'\x80\x40\x00'),
+             (0, b'\x90\x43\x50'), (60, b'\x90\x43\x00')],
+            [],
+            [(60, b'\x91\x39\x50'), (120, b'\x81\x39\x00')],
+        ], div = 60)
+
+    def tearDown(self):
+        os.remove(self.fn)
+
+    def test_note_arrays(self):
+        m = readmidi.MidiFile(self.fn)
+        self.assertEqual([len(t) for t in m.notes], [4, 0, 1])
+        n = m.notes[0]
+        self.assertEqual(list(n['pitch']), [60, 64, 67, 67])
+        self.assertEqual(list(n['duration']), [1., 1., 0., 0.])
+        self.assertEqual(list(n['velocity']), [80, 80, 80, 0])
+        self.assertEqual((m.notes[2]['channel'][0], m.notes[2]['start'][0]), (1, 1.))
+        self.assertEqual(str(m.tracks[2][0]), 'A3 80 1.0 3.0 ')
+
+    def test_overlapping_notes(self):
+        # the same pitch twice before any note off: offs close the latest note first
+        write_midi(self.fn, [[(0, b'\x90\x3c\x50'), (10, b'\x90\x3c\x50'), (10, b'\x80\x3c\x00'),
+                              (10, b'\x80\x3c\x00')]], div = 10)
+        n = readmidi.MidiFile(self.fn).notes[0]
+        self.assertEqual(list(n['duration']), [3., 1.])
+
+    def test_tempo_map(self):
+        # 100 ticks per quarter, 120 bpm until tick 200, then 60 bpm
+        tm = readmidi.TempoMap([(200, 1000000)], 100, rate = 1000)
+        self.assertEqual(list(tm.tick_to_seconds([0, 100, 200, 300])), [0., .5, 1., 2.])
+        self.assertEqual(list(tm.tick_to_sample([50, 250])), [250, 1500])
+
+    def test_events(self):
+        write_midi(self.fn, [[(0, b'\xff\x51\x03\x0f\x42\x40'), (0, b'\x90\x3c\x7f'), (100, b'\x90\x3c\x00'),
+                              (0, b'\x90\x40\x7f'), (50, b'\x80\x40\x00')]], div = 100)
+        ev = readmidi.MidiFile(self.fn).events(0)
+        self.assertEqual(list(ev['start']), [0., 1.])
+        self.assertEqual(list(ev['dur']), [1., .5])
+        self.assertEqual(list(ev['pitch']), [60, 64])
+        self.assertEqual(ev['vel'][0], 1.)
+
+    def test_track_to_song(self):
+        m = readmidi.MidiFile(self.fn)
+        self.assertEqual(readmidi.track_to_song(m.tracks[0]), [('c4', 4.), ('e4', 4.), ('g4', 4.)])
+        self.assertEqual(readmidi.track_to_song(m.tracks[2]), [('r', 4.), ('a3', 2.)])
+        self.assertEqual(readmidi.track_to_song(m.notes[0]), readmidi.track_to_song(list(m.tracks[0])))
+
+    def test_quantize(self):
+        notes = readmidi.NoteList(readmidi.np.array([(.1, .8, 60, 80, 0, 0, 0), (1.05, .02, 62, 80, 0, 0, 0), (1.9, 1.1, 64, 80, 0, 0, 0)],
+            readmidi.NOTE_DTYPE))
+        self.assertEqual(readmidi.track_to_song(notes, quantize = .5), [('c4', 4.), ('d4', 8.), ('r', 8.), ('e4', 4.)])
+
+    def test_render_tracks(self):
+        m = readmidi.MidiFile(self.fn)
+        data, rate = readmidi.render_tracks(m, {0: 'a', 2: 'a'}, jobs = 2, rate = 22050)
+        self.assertEqual(rate, 22050)
+        self.assertAlmostEqual(abs(data).max(), .5, places = 5)
+        # both tracks last 1.5 s
+        self.assertAlmostEqual(len(data) / 22050., 1.5, places = 2)
+
+    def test_render_tracks_failure(self):
+        # a track that fails must not leave shared memory behind
+        m = readmidi.MidiFile(self.fn)
+        shm = lambda: set(os.listdir('/dev/shm')) if os.path.isdir('/dev/shm') else set()
+        before = shm()
+        with self.assertRaises(ValueError):
+            readmidi.render_tracks(m, {0: 'a', 2: 'nosuchsynth'}, jobs = 2)
+        self.assertEqual(shm() - before, set())
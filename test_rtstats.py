@@ -0,0 +1,34 @@
+from unittest import TestCase
+import json, os, tempfile
+
+import numpy as np
+
+import rtstats
+
+class TestPerfMonitor(TestCase):
+    def test_ring_buffer(self):
+        mon = rtstats.PerfMonitor(size = 4, rate = 1000)
+        self.assertEqual(mon.summary(), {"blocks": 0, "xruns": 0})
+        for i in range(6):
+            mon.record(i, i + .01 * (i + 1), 100, i, 4 if i == 5 else 0, .02 if i % 2 else float('nan'))
+        c = mon.columns()
+        np.testing.assert_array_equal(c["time"], [2, 3, 4, 5])
+        np.testing.assert_allclose(c["compute"], [.03, .04, .05, .06])
+        s = mon.summary()
+        self.assertEqual((s["blocks"], s["xruns"], s["voices"]["max"]), (6, 1, 5))
+        self.assertAlmostEqual(s["load"]["max"], .6)
+        self.assertAlmostEqual(s["latency_ms"]["p50"], 20.)
+        self.assertEqual(s["status"], ["output_underflow"])
+
+    def test_dump(self):
+        mon = rtstats.PerfMonitor(rate = 1000)
+        mon.record(0., .05, 100, 3)
+        d = tempfile.mkdtemp()
+        mon.dump(os.path.join(d, "s.csv"))
+        mon.dump(os.path.join(d, "s.json"))
+        lines = open(os.path.join(d, "s.csv")).read().splitlines()
+        self.assertEqual(lines[0], "time,compute,budget,voices,status,latency")
+        self.assertEqual(len(lines), 2)
+        j = json.load(open(os.path.join(d, "s.json")))
+        self.assertEqual(j["blocks"]["latency"], [None])
+        self.assertAlmostEqual(j["summary"]["load"]["p50"], .5)
@@ -0,0 +1,77 @@
+from unittest import TestCase
+import os, struct, tempfile, wave
+
+import numpy as np
+
+import samplebank
+
+def getval(v):
+    "The per-sample decoder PySynth samp used before samplebank.py."
+    a = struct.unpack('i', v + b'\x00')[0] / 256 - 32768
+    if a > 0:
+        a =  1 - a / 32768
+    else:
+        a = -1 - a / 32768
+    return(a)
+
+class TestSampleBank(TestCase):
+    left = [0x800000, 0x7fffff, 0, 1, 0xffffff, 0x123456, 0xabcdef]
+    right = [0x7fffff, 0x800000, 0x400000, 0xc00000, 5, 0xfedcba, 0x654321]
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.raw = b''.join(struct.pack('<I', l)[:3] + struct.pack('<I', r)[:3]
+            for l, r in zip(self.left, self.right))
+        self.fns = []
+        for i in range(3):
+            fn = os.path.join(self.dir, "s%u.wav" % i)
+            w = wave.open(fn, 'wb')
+            w.setnchannels(2)
+            w.setsampwidth(3)
+            w.setframerate(48000)
+            w.writeframes(self.raw)
+            w.close()
+            self.fns.append(fn)
+
+    def tearDown(self):
+        for fn in self.fns:
+            os.remove(fn)
+        os.rmdir(self.dir)
+
+    def test_decode(self):
+        signed = lambda v: v - (1 << 24) if v & 0x800000 else v
+        for ch, vals in (0, self.left), (1, self.right):
+            d = samplebank.decode_pcm24(self.raw, 2, ch)
+            self.assertEqual(d.tolist(), [signed(v) for v in vals])
+            ref = [getval(struct.pack('<I', v)[:3]) for v in vals]
+            np.testing.assert_array_equal(samplebank.pcm24_to_float(d), np.array(ref, np.float32))
+        # a trailing partial frame is ignored
+        self.assertEqual(len(samplebank.decode_pcm24(self.raw + b'\x01\x02', 2)), 7)
+
+    def test_bank(self):
+        bank = samplebank.SampleBank()
+        a = bank.load(self.fns[0])
+        b = bank.load(self.fns[0], channel = 1)
+        self.assertIs(bank.load(self.fns[0]), a)
+        self.assertFalse(a.flags.writeable)
+        np.testing.assert_array_equal(b, [getval(struct.pack('<I', v)[:3]) for v in self.right])
+        s = bank.stats()
+        self.assertEqual((s["hits"], s["misses"], s["evictions"], s["entries"]), (1, 2, 0, 2))
+        # room for two channels of 7 float32 samples
+        bank.set_limit(2 * 28)
+        bank.load(self.fns[1])
+        bank.load(self.fns[2])
+        s = bank.stats()
+        self.assertEqual((s["misses"], s["evictions"], s["entries"]), (4, 2, 2))
+        bank.load(self.fns[0])
+        self.assertEqual(bank.stats()["misses"], 5)
+        bank.clear()
+        self.assertEqual(bank.stats()["entries"], 0)
+
+    def test_partial_load(self):
+        # only the first 7 // 3 frames are decoded and cached
+        bank = samplebank.SampleBank()
+        a = bank.load(self.fns[0], div = 3)
+        np.testing.assert_array_equal(a, bank.load(self.fns[0])[:2])
+        self.assertEqual(bank.stats()["bytes"], 4 * (2 + 7))
+        self.assertIs(bank.load(self.fns[0], div = 3), a)
@@ -0,0 +1,25 @@
+from unittest import TestCase
+
+import numpy as np
+
+import subsynth
+
+class TestLowpass(TestCase):
+    def loop(self, x, k, sp = 0.):
+        y = []
+        for v in x:
+            sp += (v - sp) / k
+            y.append(sp)
+        return np.array(y), sp
+
+    def test_matches_loop(self):
+        x = np.random.RandomState(3).uniform(-1., 1., 10000)
+        # the blocks are 4096 (k = 100) and 896 (k = 5) samples long
+        for k in 100, 5, 1:
+            y, sp = subsynth.lowpass(x, k, .3)
+            ref, rsp = self.loop(x, k, .3)
+            np.testing.assert_allclose(y, ref, rtol = 0, atol = 1e-9)
+            self.assertAlmostEqual(sp, rsp)
+
+    def test_bad_factor(self):
+        self.assertRaises(ValueError, subsynth.lowpass, np.zeros(10), .5)
@@ -0,0 +1,23 @@
+from unittest import TestCase
+import math
+
+import numpy as np
+
+import subsynth, wavetable
+
+class TestWavetable(TestCase):
+    def test_tables(self):
+        np.testing.assert_array_equal(wavetable.make_table("saw", 512), subsynth.saw_table(512))
+        x = np.arange(1000.)
+        osc = wavetable.WavetableOsc(wavetable.make_table("square"))
+        np.testing.assert_array_equal(osc.render(441., 1000), subsynth.square_osc(441., x))
+        self.assertRaises(ValueError, wavetable.make_table, "noise")
+
+    def test_harmonic_osc(self):
+        x = 2 * math.pi * 261.63 / 44100 * np.arange(5000)
+        ref = np.sin(x) + .5 * np.sin(2 * x) + .25 * np.sin(4 * x)
+        for size, err in (256, 1e-3), (2048, 2e-5):
+            osc = wavetable.WavetableOsc(wavetable.make_table("harmonic", size))
+            # the phase carries over between blocks of any length
+            y = np.concatenate([osc.render(261.63, n) for n in (64, 1, 935, 4000)])
+            self.assertLess(np.abs(y - ref).max(), err)
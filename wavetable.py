@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+# Single-cycle wavetables and an interpolating wavetable oscillator
+#   (used by midi_synth.py and by PySynth C and F through subsynth.py)
+
+# The oscillator keeps its phase in table samples and reads whole blocks
+# with linear interpolation, so there is no per-sample Python code.
+# Larger tables sound cleaner (less interpolation error), smaller ones
+# fit better into the cache of small CPUs:
+#
+#   osc = wavetable.WavetableOsc(wavetable.make_table("harmonic", 1024))
+#   block = osc.render(440., 64)
+
+from __future__ import division
+
+import math
+import numpy as np
+
+# length of the tables of PySynth C and F in samples
+wave_l1 = 2048
+
+def harmonic_table(n = 2048, partials = ((1, 1.), (2, .5), (4, .25))):
+	"sin(x) + .5 sin(2x) + .25 sin(4x) by default (the midi_synth.py sound)."
+	x = 2 * math.pi * np.arange(n) / n
+	return sum(a * np.sin(h * x) for h, a in partials)
+
+def saw_table(n = wave_l1):
+	"Sawtooth wavetable (PySynth C)."
+	return -1 + 2 * (np.arange(n) / n)
+
+def triangle_table(n = wave_l1):
+	"Triangle wavetable (PySynth F)."
+	xt = (np.arange(n) - n // 4) % n
+	half = n // 2
+	return np.where(xt < half, 1 - 2 * xt / half, -1 + 2 * (xt - half) / half)
+
+def square_table(n = 2048):
+	"Square wave starting with the low half, like PySynth D."
+	return np.where(np.arange(n) < n // 2, -1., 1.)
+
+# table shapes by name
+shapes = {
+	"harmonic": harmonic_table,
+	"saw": saw_table,
+	"square": square_table,
+	"triangle": triangle_table,
+}
+
+def make_table(shape = "harmonic", size = 2048):
+	"Return a single-cycle table of the given size for a shape name."
+	if shape not in shapes:
+		raise ValueError("unknown wavetable shape: %s" % shape)
+	return shapes[shape](size)
+
+class WavetableOsc(object):
+	"""Phase-accumulator oscillator reading a single-cycle table
+
+	The table can be any array holding one period; render() returns
+	blocks of samples and carries the phase over to the next block."""
+
+	def __init__(self, table, rate = 44100):
+		table = np.asarray(table, dtype = float)
+		self.size = len(table)
+		# one extra point, so interpolation needs no wrap-around
+		self.table = np.append(table, table[0])
+		self.rate = rate
+		self.phase = 0.		# in table samples
+		self.ramp = np.arange(0.)
+
+	def reset(self, phase = 0.):
+		"Restart the waveform at phase (in radians)."
+		self.phase = phase / (2 * math.pi) * self.size % self.size
+
+	def render(self, freq, frames):
+		"Return frames samples at freq Hz."
+		if len(self.ramp) < frames:
+			self.ramp = np.arange(float(frames))
+		inc = freq * self.size / self.rate
+		p = self.phase + inc * self.ramp[:frames]
+		np.mod(p, self.size, out = p)
+		i = p.astype(int)
+		# (p can round up to exactly size)
+		np.minimum(i, self.size - 1, out = i)
+		p -= i
+		lo = self.table[i]
+		out = lo + p * (self.table[i + 1] - lo)
+		self.phase = (self.phase + inc * frames) % self.size
+		return out
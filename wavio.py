@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+# Convert between sample arrays returned by the render() functions
+#   and 16-bit WAV files
+
+# The synths produce float samples where 1.0 corresponds to 32000
+# in the 16-bit output. NumPy is optional for writing mono files.
+
+import wave, struct
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+def write_wav(fn, data, rate = 44100, rnd = True):
+	"""Write float samples (1.0 = 32000) to a 16-bit WAV file.
+
+	data may have shape (n,) for mono or (n, channels). Samples are
+	rounded to the nearest integer if rnd is True, otherwise truncated."""
+	f = wave.open(fn, 'w')
+	f.setsampwidth(2)
+	f.setframerate(rate)
+	f.setcomptype('NONE', 'Not Compressed')
+	if np is not None:
+		x = 32000. * np.asarray(data, dtype = float)
+		f.setnchannels(1 if x.ndim < 2 else x.shape[1])
+		if rnd:
+			x = np.round(x)
+		f.writeframes(np.clip(x, -32768, 32767).astype('<i2').tobytes())
+	else:
+		conv = round if rnd else int
+		f.setnchannels(1)
+		f.writeframes(struct.pack('<%uh' % len(data), *[conv(32000 * v) for v in data]))
+	f.close()
+
+def write_wav_blocks(fn, blocks, rate = 44100, rnd = True):
+	"""Like write_wav for mono data, but takes an iterable of sample
+	blocks (arrays or lists) and writes each one as it comes, so the
+	whole song never has to be in memory."""
+	f = wave.open(fn, 'w')
+	f.setnchannels(1)
+	f.setsampwidth(2)
+	f.setframerate(rate)
+	f.setcomptype('NONE', 'Not Compressed')
+	try:
+		conv = round if rnd else int
+		for data in blocks:
+			if np is not None:
+				x = 32000. * np.asarray(data, dtype = float)
+				if rnd:
+					x = np.round(x)
+				f.writeframes(np.clip(x, -32768, 32767).astype('<i2').tobytes())
+			else:
+				f.writeframes(struct.pack('<%uh' % len(data), *[conv(32000 * v) for v in data]))
+	finally:
+		f.close()
+
+def read_wav(fn):
+	"Read a 16-bit WAV file, return (float32 array with 1.0 = 32000, rate)."
+	f = wave.open(fn, 'r')
+	try:
+		nch = f.getnchannels()
+		x = np.frombuffer(f.readframes(f.getnframes()), '<i2')
+		rate = f.getframerate()
+	finally:
+		f.close()
+	x = (x / 32000.).astype(np.float32)
+	if nch > 1:
+		x = x.reshape(-1, nch)
+	return x, rate